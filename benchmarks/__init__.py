@@ -0,0 +1 @@
+"""Benchmarks for the app's hot paths on synthetic data (python -m benchmarks.run)."""
@@ -0,0 +1,81 @@
+"""
+Benchmark for utils.mapping_uk_to_en: checks that the vectorized recode gives the
+same output as the previous row-wise implementation and reports rows/sec.
+
+    python benchmarks/bench_mapping_uk_to_en.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utils  # noqa: E402
+
+
+def mapping_uk_to_en_rowwise(df_t):
+    """The previous implementation, kept here as the reference for equality checks."""
+    df = df_t.copy()
+    df['eotypename'] = df['eotypename'].apply(
+        lambda x: utils.school_type_mapping.get(x, 'unknown'))
+    df['settlement_type'] = df['settlement_type'].apply(
+        lambda x: utils.settlement_type_map.get(x, 'unknown'))
+    df['regname'] = df['regname'].apply(
+        lambda x: utils.oblast_mapping.get(x, 'unknown'))
+    df['sex'] = df['sextypename'].map({'чоловіча': 1, 'жіноча': 0})
+    df.drop('sextypename', axis=1, inplace=True)
+    df['age'] = df['exam_year'] - df['birth']
+    df.drop(columns=['exam_year', 'birth'], inplace=True)
+    df.drop(columns=['regtypename', 'eoname', 'testdate',
+                     'ptregname', 'settlement_name'], errors='ignore', inplace=True)
+    return df
+
+
+def make_input(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # a few values outside the mappings and NaNs exercise the 'unknown' branch
+    school_types = list(utils.school_type_mapping) + ['невідомий тип', np.nan]
+    settlement_types = list(utils.settlement_type_map) + ['хутір', np.nan]
+    oblasts = list(utils.oblast_mapping) + ['Автономна Республіка Крим', np.nan]
+    exam_year = rng.integers(2016, 2025, n_rows)
+    return pd.DataFrame({
+        'exam_year': exam_year,
+        'birth': exam_year - rng.integers(15, 22, n_rows),
+        'sextypename': rng.choice(['чоловіча', 'жіноча'], n_rows),
+        'regname': rng.choice(np.array(oblasts, dtype=object), n_rows),
+        'settlement_type': rng.choice(np.array(settlement_types, dtype=object), n_rows),
+        'eotypename': rng.choice(np.array(school_types, dtype=object), n_rows),
+        'settlement_name': 'м.Київ',
+    })
+
+
+def rows_per_sec(func, df, repeat=3):
+    best = min(_timed(func, df) for _ in range(repeat))
+    return len(df) / best, best
+
+
+def _timed(func, df):
+    start = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start
+
+
+def main(n_rows=1_000_000):
+    df = make_input(n_rows)
+    pd.testing.assert_frame_equal(utils.mapping_uk_to_en(df), mapping_uk_to_en_rowwise(df))
+    categorical = df.astype({col: 'category' for col in ['regname', 'settlement_type', 'eotypename']})
+    pd.testing.assert_frame_equal(utils.mapping_uk_to_en(categorical), mapping_uk_to_en_rowwise(df),
+                                  check_dtype=False)
+
+    for name, func, frame in [('row-wise (reference)', mapping_uk_to_en_rowwise, df),
+                              ('vectorized', utils.mapping_uk_to_en, df),
+                              ('vectorized, categorical input', utils.mapping_uk_to_en, categorical)]:
+        rate, seconds = rows_per_sec(func, frame)
+        print(f"{name:32s} {n_rows:>10,d} rows  {seconds:8.3f} s  {rate:14,.0f} rows/sec")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
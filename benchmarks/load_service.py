@@ -0,0 +1,122 @@
+"""
+Load generator for src/prediction_service.py: many small concurrent /predict requests.
+
+Without --url it trains synthetic models (benchmarks/synthetic.py) into a temp dir,
+starts the service on a free local port and stops it afterwards, so nothing external
+is needed:
+
+    python -m benchmarks.load_service --requests 5000 --concurrency 64
+    python -m benchmarks.load_service --max-batch 1            # baseline without batching
+    python -m benchmarks.load_service --url http://localhost:8502
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from benchmarks import synthetic
+
+# synthetic puts src/ on sys.path
+from scoring import FEATURE_COLS, SUBJECTS_CONFIG  # noqa: E402
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'prediction_service.py')
+
+
+def make_payloads(n, seed=0):
+    """Request bodies with features from the synthetic main_df and random school grades."""
+    rng = np.random.default_rng(seed)
+    features = synthetic.make_main_df(n, synthetic.make_schools(rng, 500, 1000), rng)[FEATURE_COLS]
+    payloads = []
+    for row in features.to_dict('records'):
+        row = {col: value.item() if hasattr(value, 'item') else value for col, value in row.items()}
+        row['o12'] = {config['key']: round(float(rng.uniform(4, 12)), 1) for config in SUBJECTS_CONFIG.values()}
+        payloads.append(json.dumps(row, ensure_ascii=False))
+    return payloads
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(client, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.fetch(f"{url}/healthz")
+            return
+        except (OSError, HTTPClientError):
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not become ready in {timeout} s")
+
+
+async def generate_load(url, payloads, concurrency):
+    """Sends every payload with `concurrency` requests in flight; returns per-request latencies and errors."""
+    client = AsyncHTTPClient(max_clients=concurrency)
+    await wait_ready(client, url)
+    latencies, errors = [], 0
+    queue = iter(payloads)
+
+    async def worker():
+        nonlocal errors
+        for body in queue:
+            start = time.perf_counter()
+            try:
+                await client.fetch(f"{url}/predict", method='POST', body=body)
+            except (OSError, HTTPClientError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    metrics = (await client.fetch(f"{url}/metrics")).body.decode()
+    return np.array(latencies), errors, elapsed, metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent /predict load against the prediction service.")
+    parser.add_argument("--url", help="running service (started locally with synthetic models if omitted)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=256, help="--max-batch of the spawned service")
+    parser.add_argument("--max-delay-ms", type=float, default=5.0, help="--max-delay-ms of the spawned service")
+    args = parser.parse_args(argv)
+
+    payloads = make_payloads(args.requests)
+    service = models_dir = None
+    url = args.url
+    if url is None:
+        models_dir = tempfile.mkdtemp(prefix='nmt_service_')
+        synthetic.write_main_df(os.path.join(models_dir, 'main_df.csv'), 20_000)
+        synthetic.write_models(models_dir, os.path.join(models_dir, 'main_df.csv'), n_train=20_000)
+        port = free_port()
+        service = subprocess.Popen([sys.executable, SERVICE, '--port', str(port), '--models-dir', models_dir,
+                                    '--max-batch', str(args.max_batch), '--max-delay-ms', str(args.max_delay_ms)])
+        url = f"http://127.0.0.1:{port}"
+    try:
+        latencies, errors, elapsed, metrics = asyncio.run(generate_load(url, payloads, args.concurrency))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+            shutil.rmtree(models_dir, ignore_errors=True)
+
+    p50, p95, p99 = np.quantile(latencies, [0.5, 0.95, 0.99]) * 1000
+    print(f"{len(latencies):,} requests, concurrency {args.concurrency}: {len(latencies) / elapsed:,.0f} req/s, "
+          f"latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, errors {errors}")
+    print(''.join(line + '\n' for line in metrics.splitlines() if not line.startswith('#')), end='')
+
+
+if __name__ == '__main__':
+    main()
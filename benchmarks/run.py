@@ -0,0 +1,305 @@
+"""
+Timing harness for the app's hot paths on synthetic data (see benchmarks/synthetic.py).
+
+Every case is timed `--repeat` times; best and median seconds and items/sec are
+written to a JSON file so runs can be compared:
+
+    python -m benchmarks.run --rows 1m --output results/main.json
+    python -m benchmarks.run --rows 1m --output results/branch.json --compare results/main.json
+    python -m benchmarks.run --data /tmp/nmt_bench --only load analiz
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import bench_mapping_uk_to_en, synthetic
+
+# bench_mapping_uk_to_en / synthetic put src/ on sys.path
+import utils  # noqa: E402
+from admission import OfferIndex, chance_matrix, classify_admission_chances, cohort_band_counts  # noqa: E402
+from aggregates import FoldedAggregates, IndexedAggregates, read_aggregates, stream_aggregates, write_aggregates  # noqa: E402
+from dataset import main_df_content_version, read_main_df, read_main_df_csv, shared_main_df  # noqa: E402
+from figures import box_stats, histogram_png  # noqa: E402
+from filter_index import ALL, FilterIndex  # noqa: E402
+from offers import compile_offers, read_offers, read_offers_csv  # noqa: E402
+from scoring import FEATURE_COLS, SUBJECTS_CONFIG, MultiSubjectPredictor  # noqa: E402
+from shared_store import SharedStore  # noqa: E402
+from stats_cube import SCORE_COLS, StatsCube  # noqa: E402
+
+RESULTS_VERSION = 1
+# Noise from sklearn on every single-row predict; it does not affect the timings
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+GROUPS = {}
+
+
+def group(name):
+    """Registers a benchmark group: a function of Context returning [(case, callable, n_items)]."""
+    def register(func):
+        GROUPS[name] = func
+        return func
+    return register
+
+
+class Context:
+    """Synthetic inputs and the objects built from them, created on first use."""
+
+    def __init__(self, data_dir, seed=0):
+        self.data_dir = data_dir
+        self.rng = np.random.default_rng(seed)
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    @cached_property
+    def frame(self):
+        return read_main_df(csv_path=self.path('main_df.csv'), parquet_path=self.path('main_df.parquet'))
+
+    @cached_property
+    def filter_index(self):
+        return FilterIndex(self.frame)
+
+    @cached_property
+    def stats_cube(self):
+        return StatsCube(self.frame, self.filter_index)
+
+    @cached_property
+    def offers(self):
+        offers = pd.read_csv(self.path('konkurs_NMT.csv'))
+        columns = ['шк_Мін. бал\n(на загальних підставах)', 'шк_Сер. бал\n(на загальних підставах)',
+                   'шк_Макс. бал\n(на загальних підставах)']
+        return [pd.to_numeric(offers[col].str.replace(',', '.'), errors='coerce').to_numpy() for col in columns]
+
+    @cached_property
+    def models(self):
+        import joblib
+        return {config['key']: joblib.load(self.path(os.path.basename(config['model_path'])))
+                for config in SUBJECTS_CONFIG.values()}
+
+    def random_selection(self, depth):
+        """Selection down to `depth` levels of the analiz cascade along an existing path."""
+        selection = []
+        for _ in range(depth):
+            options = self.filter_index.options(tuple(selection))
+            selection.append(options[self.rng.integers(len(options))])
+        return tuple(selection) + (ALL,) * (len(self.filter_index.levels) - depth)
+
+
+@group('load')
+def bench_load(ctx):
+    n = len(ctx.frame)
+    store = SharedStore(ctx.path('shared_store'))
+    shared_main_df(store, ctx.path('main_df.csv'))
+    return [
+        ('read_main_df (Parquet)', lambda: read_main_df(csv_path=ctx.path('main_df.csv'),
+                                                         parquet_path=ctx.path('main_df.parquet')), n),
+        ('read_main_df (Parquet, 3 score columns)', lambda: read_main_df(
+            columns=SCORE_COLS, csv_path=ctx.path('main_df.csv'), parquet_path=ctx.path('main_df.parquet')), n),
+        ('read_main_df_csv', lambda: read_main_df_csv(ctx.path('main_df.csv')), n),
+        ('shared_main_df (memory map)', lambda: shared_main_df(store, ctx.path('main_df.csv')), n),
+    ]
+
+
+@group('offers')
+def bench_offers(ctx):
+    csv_path, offers_path = ctx.path('konkurs_NMT.csv'), ctx.path('offers.arrow')
+    compile_offers(csv_path, offers_path)
+    n = len(read_offers(csv_path, offers_path))
+    return [
+        ('offers from CSV (parse + aggregate)', lambda: read_offers_csv(csv_path), n),
+        ('offers compiled (memory map)', lambda: read_offers(csv_path, offers_path), n),
+    ]
+
+
+@group('analiz')
+def bench_analiz(ctx):
+    selections = [ctx.random_selection(depth) for depth in (1, 2, 3, 5)]
+
+    def cascade():
+        for selection in selections:
+            for depth in range(len(selection)):
+                ctx.filter_index.options(selection[:depth])
+            ctx.filter_index.rows(selection)
+
+    return [
+        ('FilterIndex build', lambda: FilterIndex(ctx.frame), len(ctx.frame)),
+        ('filter cascade (4 selections)', cascade, len(selections)),
+    ]
+
+
+@group('describe')
+def bench_describe(ctx):
+    selection = ctx.random_selection(2)
+    cells = ctx.filter_index.cells(selection)
+    summary = ctx.stats_cube.merge(SCORE_COLS[0], cells)
+    return [
+        ('StatsCube build', lambda: StatsCube(ctx.frame, ctx.filter_index), len(ctx.frame)),
+        ('describe (year+region)', lambda: ctx.stats_cube.describe(cells), 1),
+        ('describe (all rows)', lambda: ctx.stats_cube.describe(None), 1),
+        ('pandas describe (year+region, reference)',
+         lambda: ctx.frame.take(ctx.filter_index.rows(selection))[SCORE_COLS].describe(), 1),
+        ('box_stats', lambda: box_stats(summary, SCORE_COLS[0]), 1),
+        # __wrapped__ bypasses the figure LRU cache to time the matplotlib render itself
+        ('histogram PNG render', lambda: histogram_png.__wrapped__(None, selection, SCORE_COLS[0], summary), 1),
+    ]
+
+
+@group('page_2')
+def bench_page_2(ctx):
+    indexed = IndexedAggregates(ctx.frame)
+    years = sorted(ctx.frame['exam_year'].unique())[-2:]
+    regions = list(ctx.frame['regname'].cat.categories[:3])
+    materialized_dir = tempfile.mkdtemp(prefix='nmt_aggregates_')
+    source = ctx.path('main_df.parquet')
+    version = main_df_content_version(ctx.path('main_df.csv'))
+    write_aggregates(stream_aggregates(source), version, materialized_dir)
+    materialized = FoldedAggregates(read_aggregates(version, materialized_dir))
+    return [
+        ('IndexedAggregates build', lambda: IndexedAggregates(ctx.frame), len(ctx.frame)),
+        ('bitmap select (2 years x 3 regions)', lambda: indexed.select(years, regions), 1),
+        ('stream_aggregates (Parquet)', lambda: stream_aggregates(source), len(ctx.frame)),
+        ('materialized select (2 years x 3 regions)', lambda: materialized.select(years, regions), 1),
+    ]
+
+
+@group('mapping')
+def bench_mapping(ctx):
+    features = ctx.frame[FEATURE_COLS]
+    with_unknowns = bench_mapping_uk_to_en.make_input(len(features))
+    return [
+        ('mapping_uk_to_en (categorical main_df)', lambda: utils.mapping_uk_to_en(features), len(features)),
+        ('mapping_uk_to_en (object, with unknowns)', lambda: utils.mapping_uk_to_en(with_unknowns), len(with_unknowns)),
+    ]
+
+
+@group('predict')
+def bench_predict(ctx):
+    model = ctx.models['math']
+    single = ctx.frame[FEATURE_COLS].head(1).astype(object)
+    bulk = ctx.frame[FEATURE_COLS].head(10_000)
+    predictor = MultiSubjectPredictor(ctx.models)
+    # Shared encoding must give exactly the per-pipeline predictions
+    for key, predictions in predictor.predict(bulk).items():
+        np.testing.assert_array_equal(predictions, ctx.models[key].predict(bulk))
+    return [
+        ('predict 1 row (math)', lambda: model.predict(single), 1),
+        ('predict 10k rows (math)', lambda: model.predict(bulk), len(bulk)),
+        ('predict 1 row x 3 subjects', lambda: [m.predict(single) for m in ctx.models.values()], 3),
+        ('predict 1 row x 3 subjects (shared encoding)', lambda: predictor.predict(single), 3),
+        ('predict 10k rows x 3 subjects', lambda: [m.predict(bulk) for m in ctx.models.values()], 3 * len(bulk)),
+        ('predict 10k rows x 3 subjects (shared encoding)', lambda: predictor.predict(bulk), 3 * len(bulk)),
+    ]
+
+
+@group('chances')
+def bench_chances(ctx):
+    min_score, avg_score, max_score = ctx.offers
+    cohort = ctx.rng.uniform(120, 200, 1_000)[:, None]
+    offer_index = OfferIndex(min_score, avg_score, max_score)
+    return [
+        ('classify all offers (1 applicant)',
+         lambda: classify_admission_chances(155.0, min_score, avg_score, max_score), len(min_score)),
+        ('classify all offers (1000 applicants)',
+         lambda: classify_admission_chances(cohort, min_score, avg_score, max_score), cohort.size * len(min_score)),
+        ('chance_matrix (1000 applicants, chunked)',
+         lambda: chance_matrix(cohort[:, 0], min_score, avg_score, max_score), cohort.size * len(min_score)),
+        ('cohort_band_counts (1000 applicants)',
+         lambda: cohort_band_counts(cohort[:, 0], min_score, avg_score, max_score), cohort.size * len(min_score)),
+        ('OfferIndex build', lambda: OfferIndex(min_score, avg_score, max_score), len(min_score)),
+        ('OfferIndex band counts (1 applicant)', lambda: offer_index.band_counts(155.0), len(min_score)),
+        ('OfferIndex band (1 applicant)', lambda: offer_index.band(155.0, 3), 1),
+        ('OfferIndex 10 closest offers', lambda: offer_index.closest(155.0, 10), 10),
+    ]
+
+
+def time_case(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(ctx, groups, repeat):
+    results = {}
+    for group_name in groups:
+        for case, func, n_items in GROUPS[group_name](ctx):
+            timings = time_case(func, repeat)
+            best = min(timings)
+            results[f"{group_name}/{case}"] = {
+                'best_s': best, 'median_s': statistics.median(timings), 'repeat': repeat,
+                'items': n_items, 'items_per_s': n_items / best if best else None,
+            }
+            print(f"{group_name + '/' + case:60s} {best * 1000:10.2f} ms  {n_items / best if best else 0:14,.0f} items/s")
+    return results
+
+
+def metadata(ctx):
+    commit = None
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    return {
+        'version': RESULTS_VERSION, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit, 'rows': len(ctx.frame), 'python': platform.python_version(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Prints current/baseline ratios; returns the cases slower than `threshold`."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        ratio = result['best_s'] / baseline[case]['best_s']
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print(f"{case:60s} {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(case)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths on synthetic data.")
+    parser.add_argument("--rows", type=synthetic.parse_rows, default=synthetic.SIZES['100k'],
+                        help="rows to generate when --data is not given: 100k, 1m, 10m or a number")
+    parser.add_argument("--data", help="directory made by benchmarks.synthetic (generated into a temp dir if omitted)")
+    parser.add_argument("--only", nargs="*", choices=list(GROUPS), default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    data_dir = args.data
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix='nmt_bench_')
+        print(f"generating {args.rows:,} synthetic rows in {data_dir}")
+        synthetic.generate(data_dir, args.rows, models='predict' in args.only)
+    ctx = Context(data_dir)
+    results = run(ctx, args.only, args.repeat)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'meta': metadata(ctx), 'results': results}, output_file, ensure_ascii=False, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
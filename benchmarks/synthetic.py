@@ -0,0 +1,187 @@
+"""
+Synthetic inputs for the benchmarks: main_df.csv (+ Parquet), konkurs_NMT.csv and
+model pipelines with the same structure as the production ones. No real data or
+network access is needed.
+
+Rows are generated school by school so the analiz cascade sees a consistent
+hierarchy (every school lies in one settlement, every settlement in one region),
+and school/settlement sizes are Zipf-like as in the open UCEQA data.
+
+    python -m benchmarks.synthetic --rows 1000000 --out /tmp/nmt_bench
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utils  # noqa: E402
+from dataset import convert_csv_to_parquet  # noqa: E402
+from scoring import (SUBJECTS_CONFIG, FEATURE_COLS, oblast_options, settlement_types_options,  # noqa: E402
+                     school_types_options)
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Realistic cardinalities for one full export (all years)
+N_SETTLEMENTS = 11_000
+N_SCHOOLS = 15_000
+N_UNIVERSITIES = 300
+N_SPECIALTIES = 250
+EXAM_YEARS = np.arange(2016, 2025)
+SCORE_COLS = {'ukrball100': 0.03, 'mathball100': 0.15, 'histball100': 0.2}  # column -> share of NaN
+REGTYPE_NAMES = ['Випускник закладу загальної середньої освіти поточного року',
+                 'Випускник минулих років', 'Випускник закладу професійної освіти']
+
+
+def _zipf_weights(n, exponent, rng):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def make_schools(rng, n_settlements=N_SETTLEMENTS, n_schools=N_SCHOOLS):
+    """School table: eoname, eotypename, settlement_name, settlement_type, regname."""
+    settlement_region = rng.choice(oblast_options, n_settlements, p=_zipf_weights(len(oblast_options), 0.6, rng))
+    settlement_type = rng.choice(settlement_types_options, n_settlements, p=[0.01, 0.12, 0.72, 0.12, 0.03])
+    settlement_name = np.array([f"н.п. {i}" for i in range(n_settlements)], dtype=object)
+    # Cities get most of the schools
+    settlement_of_school = rng.choice(n_settlements, n_schools, p=_zipf_weights(n_settlements, 1.1, rng))
+    school_type = rng.choice(school_types_options, n_schools, p=_zipf_weights(len(school_types_options), 1.5, rng))
+    return pd.DataFrame({
+        'eoname': [f"{kind} №{i} ({settlement_name[s]})" for i, (kind, s) in enumerate(zip(school_type, settlement_of_school))],
+        'eotypename': school_type,
+        'settlement_name': settlement_name[settlement_of_school],
+        'settlement_type': settlement_type[settlement_of_school],
+        'regname': settlement_region[settlement_of_school],
+    })
+
+
+def make_main_df(n_rows, schools, rng):
+    """One chunk of main_df rows in the column order of the real export."""
+    school = schools.iloc[rng.choice(len(schools), n_rows, p=_zipf_weights(len(schools), 0.8, rng))].reset_index(drop=True)
+    exam_year = rng.choice(EXAM_YEARS, n_rows)
+    session_day = rng.integers(0, 50, n_rows)
+    df = pd.DataFrame({
+        'exam_year': exam_year,
+        'birth': exam_year - rng.choice([16, 17, 18, 19, 20], n_rows, p=[0.05, 0.7, 0.2, 0.04, 0.01]),
+        'sextypename': rng.choice(['чоловіча', 'жіноча'], n_rows),
+        'regname': school['regname'],
+        'settlement_type': school['settlement_type'],
+        'settlement_name': school['settlement_name'],
+        'eoname': school['eoname'],
+        'eotypename': school['eotypename'],
+        'regtypename': rng.choice(REGTYPE_NAMES, n_rows, p=[0.85, 0.1, 0.05]),
+        'ptregname': np.where(rng.random(n_rows) < 0.9, school['regname'], rng.choice(oblast_options, n_rows)),
+        'testdate': (pd.to_datetime(exam_year.astype(str) + '-05-20') + pd.to_timedelta(session_day, 'D')).strftime('%Y-%m-%d'),
+    })
+    for col, missing in SCORE_COLS.items():
+        scores = np.clip(np.round(rng.normal(145, 25, n_rows)), 100, 200)
+        scores[rng.random(n_rows) < missing] = np.nan
+        df[col] = scores
+    return df
+
+
+def write_main_df(path, n_rows, seed=0, chunksize=1_000_000):
+    """Writes main_df.csv chunk by chunk so 10M rows never sit in memory at once."""
+    rng = np.random.default_rng(seed)
+    schools = make_schools(rng)
+    for start in range(0, n_rows, chunksize):
+        chunk = make_main_df(min(chunksize, n_rows - start), schools, rng)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def make_konkurs(n_offers=20_000, seed=0):
+    """Offers table with the raw konkurs_NMT.csv columns (comma decimals, '-' for missing)."""
+    rng = np.random.default_rng(seed)
+    min_score = rng.uniform(110, 175, n_offers)
+    avg_score = min_score + rng.uniform(0, 20, n_offers)
+    max_score = avg_score + rng.uniform(0, 20, n_offers)
+    as_text = lambda values: [f"{value:.2f}".replace('.', ',') for value in values]
+    df = pd.DataFrame({
+        'Рік': rng.integers(2022, 2025, n_offers),
+        'Назва закладу': rng.choice([f"Університет {i}" for i in range(N_UNIVERSITIES)], n_offers,
+                                    p=_zipf_weights(N_UNIVERSITIES, 0.7, rng)),
+        'Спеціальність': rng.choice([f"Спеціальність {i}" for i in range(N_SPECIALTIES)], n_offers),
+        'Освітній ступінь': rng.choice(['Бакалавр', 'Магістр'], n_offers, p=[0.8, 0.2]),
+        'Вступ на основі': rng.choice(['Повна загальна середня освіта', 'НРК5', 'НРК6'], n_offers, p=[0.8, 0.15, 0.05]),
+        'Форма навчання': rng.choice(np.array(['Денна', 'Заочна', None], dtype=object), n_offers, p=[0.7, 0.25, 0.05]),
+        'шк_Мін. бал\n(на загальних підставах)': as_text(min_score),
+        'шк_Сер. бал\n(на загальних підставах)': as_text(avg_score),
+        'шк_Макс. бал\n(на загальних підставах)': as_text(max_score),
+    })
+    df.loc[::97, 'шк_Сер. бал\n(на загальних підставах)'] = '-'
+    return df
+
+
+def make_model(train, target, n_estimators=100):
+    """Pipeline with the production structure: mapping_uk_to_en -> ordinal encoding -> LightGBM."""
+    from lightgbm import LGBMRegressor
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OrdinalEncoder
+
+    categorical = ['regname', 'settlement_type', 'eotypename']
+    return Pipeline([
+        ('mapping', FunctionTransformer(utils.mapping_uk_to_en, feature_names_out=utils.function_feature_names)),
+        ('encoding', ColumnTransformer(
+            [('categorical', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1), categorical)],
+            remainder='passthrough')),
+        ('model', LGBMRegressor(n_estimators=n_estimators, verbose=-1)),
+    ]).fit(train[FEATURE_COLS], target)
+
+
+def write_models(out_dir, main_df_path, n_train=50_000, seed=0):
+    """Trains one synthetic model per subject on a sample of main_df; returns {key: path}."""
+    import joblib
+
+    train = pd.read_csv(main_df_path, nrows=n_train)
+    score_col = {'new': 'ukrball100', 'math': 'mathball100', 'hist': 'histball100'}
+    paths = {}
+    for config in SUBJECTS_CONFIG.values():
+        target = train[score_col[config['key']]]
+        known = target.notna()
+        path = os.path.join(out_dir, os.path.basename(config['model_path']))
+        joblib.dump(make_model(train[known], target[known]), path)
+        paths[config['key']] = path
+    return paths
+
+
+def generate(out_dir, n_rows, n_offers=20_000, seed=0, parquet=True, models=True):
+    """Writes every synthetic input into `out_dir` with the file names the app uses."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {'main_df_csv': write_main_df(os.path.join(out_dir, 'main_df.csv'), n_rows, seed)}
+    if parquet:
+        paths['main_df_parquet'] = convert_csv_to_parquet(paths['main_df_csv'], os.path.join(out_dir, 'main_df.parquet'))
+    paths['konkurs'] = os.path.join(out_dir, 'konkurs_NMT.csv')
+    make_konkurs(n_offers, seed).to_csv(paths['konkurs'], index=False)
+    if models:
+        paths['models'] = write_models(out_dir, paths['main_df_csv'], seed=seed)
+    return paths
+
+
+def parse_rows(value):
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic inputs for the benchmarks.")
+    parser.add_argument("--rows", type=parse_rows, default=SIZES['100k'], help="main_df rows: 100k, 1m, 10m or a number")
+    parser.add_argument("--offers", type=int, default=20_000)
+    parser.add_argument("--out", default="benchmarks/data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-parquet", action="store_true")
+    parser.add_argument("--no-models", action="store_true")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    paths = generate(args.out, args.rows, args.offers, args.seed, not args.no_parquet, not args.no_models)
+    print(f"{args.rows:,} rows in {time.perf_counter() - start:.1f} s -> {paths}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import numpy as np
+
+# --- РІВНІ ШАНСІВ НА ВСТУП ---
+# Позиція мітки у списку - її порядковий код: менший код означає вищий шанс.
+CHANCE_LABELS = np.array([
+    "🏆 Дуже високий шанс (вище макс.)", "🥇 Дуже високий шанс", "🥈 Високий шанс",
+    "🥉 Хороший шанс", "👍 Задовільний шанс", "😐 Середній шанс (конкурсна)",
+    "⚠️ Низький шанс (на межі)", "📉 Дуже низький шанс", "📉📉 Вкрай низький шанс",
+    "Н/Д (немає даних по спеціальності)", "Н/Д (немає балу абітурієнта)"
+], dtype=object)
+CHANCE_NO_OFFER_DATA = 9
+CHANCE_NO_APPLICANT_SCORE = 10
+
+# Порядок шансів для сортування та фільтрації
+CHANCE_ORDER_MAP = {label: code for code, label in enumerate(CHANCE_LABELS)}
+
+
+def chance_thresholds(min_score, avg_score, max_score):
+    """
+    Нижні межі рівнів шансів 0..7 для кожної пропозиції (перший вимір - код рівня):
+    абітурієнт потрапляє в рівень k, якщо його бал >= межі k і менший за межі 0..k-1.
+    """
+    min_score = np.asarray(min_score, dtype=float)
+    avg_score = np.asarray(avg_score, dtype=float)
+    max_score = np.asarray(max_score, dtype=float)
+    return np.stack(np.broadcast_arrays(
+        max_score,
+        avg_score + (max_score - avg_score) * 0.75,
+        avg_score + (max_score - avg_score) * 0.25,
+        avg_score,
+        min_score + (avg_score - min_score) * 0.75,
+        min_score,
+        min_score * 0.95,
+        min_score * 0.9,
+    ))
+
+
+def classify_admission_chances(applicant_score, min_score, avg_score, max_score):
+    """
+    Векторна класифікація шансів: повертає масив кодів (індексів у CHANCE_LABELS)
+    для всіх пропозицій одразу. Межі кожного рівня рахуються масивами, а рівень -
+    перша умова, що виконалась (як у ланцюжку if/elif get_admission_chances).
+    Аргументи транслюються за правилами NumPy, тож `applicant_score` може бути масивом.
+    """
+    thresholds = chance_thresholds(min_score, avg_score, max_score)
+    if applicant_score is None:
+        return np.full(thresholds.shape[1:], CHANCE_NO_APPLICANT_SCORE, dtype=np.int8)
+    return _classify(np.asarray(applicant_score, dtype=float), thresholds, _no_offer_data(thresholds))
+
+
+def _no_offer_data(thresholds):
+    # Межі 0, 3 і 5 - самі макс., сер. та мін. бали
+    return np.isnan(thresholds[[0, 3, 5]]).any(axis=0)
+
+
+def _classify(score, thresholds, no_data):
+    conditions = [no_data] + [score >= threshold for threshold in thresholds]
+    choices = [CHANCE_NO_OFFER_DATA, 0, 1, 2, 3, 4, 5, 6, 7]
+    return np.select(conditions, choices, default=8).astype(np.int8)
+
+
+# Скільки комірок матриці абітурієнти x пропозиції класифікується за один прохід:
+# код і маска порівняння займають 2 байти на комірку, тобто ~8 МБ на частину
+CHANCE_MATRIX_CHUNK_CELLS = 4_000_000
+
+
+def iter_chance_matrix(applicant_scores, min_score, avg_score, max_score, chunk_cells=CHANCE_MATRIX_CHUNK_CELLS):
+    """
+    Матриця кодів шансів абітурієнти x пропозиції частинами по рядках: (початок, int8 масив
+    (частина абітурієнтів, пропозиції)). Межі пропозицій рахуються один раз, а кожна частина
+    класифікується транслюванням стовпця балів на рядок меж, тож пам'ять обмежена `chunk_cells`.
+    """
+    scores = np.asarray(applicant_scores, dtype=float)
+    thresholds = chance_thresholds(min_score, avg_score, max_score)
+    no_data = _no_offer_data(thresholds)
+    # Для пропозицій зі спадними межами код рівня - кількість не досягнутих меж
+    monotone = ~no_data & (np.diff(thresholds, axis=0) <= 0).all(axis=0)
+    irregular = np.flatnonzero(~no_data & ~monotone)
+    chunk_rows = max(1, chunk_cells // max(1, thresholds.shape[1]))
+    for start in range(0, len(scores), chunk_rows):
+        chunk = scores[start:start + chunk_rows, None]
+        codes = np.zeros((len(chunk), thresholds.shape[1]), dtype=np.int8)
+        for threshold in thresholds:
+            codes += chunk < threshold
+        codes[:, no_data] = CHANCE_NO_OFFER_DATA
+        if len(irregular):
+            codes[:, irregular] = _classify(chunk, thresholds[:, irregular], False)
+        codes[np.isnan(chunk[:, 0])] = CHANCE_NO_APPLICANT_SCORE
+        yield start, codes
+
+
+def chance_matrix(applicant_scores, min_score, avg_score, max_score, chunk_cells=CHANCE_MATRIX_CHUNK_CELLS):
+    """Повна матриця кодів шансів абітурієнти x пропозиції (int8, 1 байт на комірку)."""
+    n_offers = len(np.atleast_1d(min_score))
+    matrix = np.empty((len(applicant_scores), n_offers), dtype=np.int8)
+    for start, codes in iter_chance_matrix(applicant_scores, min_score, avg_score, max_score, chunk_cells):
+        matrix[start:start + len(codes)] = codes
+    return matrix
+
+
+def cohort_band_counts(applicant_scores, min_score, avg_score, max_score, chunk_cells=CHANCE_MATRIX_CHUNK_CELLS):
+    """
+    Підсумки матриці шансів без її збереження: (кількість абітурієнтів кожного рівня для кожної
+    пропозиції - масив (пропозиції, рівні), кількість пропозицій кожного рівня для кожного
+    абітурієнта - масив (абітурієнти, рівні)).
+    """
+    n_labels = len(CHANCE_LABELS)
+    n_offers = len(np.atleast_1d(min_score))
+    per_offer = np.zeros(n_offers * n_labels, dtype=np.int64)
+    per_applicant = np.zeros((len(applicant_scores), n_labels), dtype=np.int64)
+    offer_offsets = np.arange(n_offers) * n_labels
+    for start, codes in iter_chance_matrix(applicant_scores, min_score, avg_score, max_score, chunk_cells):
+        # Один bincount за парами (пропозиція, рівень) та (абітурієнт, рівень) для всієї частини
+        per_offer += np.bincount((offer_offsets + codes).ravel(), minlength=n_offers * n_labels)
+        applicant_offsets = np.arange(len(codes))[:, None] * n_labels
+        per_applicant[start:start + len(codes)] = np.bincount(
+            (applicant_offsets + codes).ravel(), minlength=len(codes) * n_labels).reshape(len(codes), n_labels)
+    return per_offer.reshape(n_offers, n_labels), per_applicant
+
+
+def get_admission_chances(applicant_score, min_score, avg_score, max_score):
+    """Мітка шансу для однієї пропозиції."""
+    return CHANCE_LABELS[int(classify_admission_chances(applicant_score, min_score, avg_score, max_score))]
+
+
+class OfferIndex:
+    """
+    Пошуковий індекс пропозицій за межами рівнів шансів.
+
+    Для кожного рівня k межі всіх пропозицій відсортовані, тож кількість пропозицій, для
+    яких бал абітурієнта >= межі k, - один бінарний пошук. Якщо межі пропозиції спадають
+    з рівнем (мін. <= сер. <= макс.), вона потрапляє в рівень k, коли бал між межами k та k-1,
+    і кількості за рівнями - різниці сусідніх пошуків. Пропозиції рівня k лежать у відсортованих
+    межах k між двома бінарними пошуками: бал мінус найбільша ширина рівня (межа k-1 мінус
+    межа k) та сам бал. Пропозиції з іншим порядком меж (помилки в даних) класифікуються напряму. Середні бали відсортовані окремо для пошуку
+    найближчих до балу абітурієнта пропозицій.
+
+    Позиції - номери рядків у масивах, з яких побудовано індекс.
+    """
+
+    def __init__(self, min_score, avg_score, max_score):
+        self.thresholds = chance_thresholds(min_score, avg_score, max_score)
+        self.n_offers = self.thresholds.shape[1]
+        no_data = _no_offer_data(self.thresholds)
+        monotone = ~no_data & (np.diff(self.thresholds, axis=0) <= 0).all(axis=0)
+        self.no_data = np.flatnonzero(no_data)
+        self.irregular = np.flatnonzero(~no_data & ~monotone)
+        regular = np.flatnonzero(monotone)
+        self.orders = [regular[np.argsort(threshold[regular], kind='stable')] for threshold in self.thresholds]
+        self.sorted_thresholds = [threshold[order] for threshold, order in zip(self.thresholds, self.orders)]
+        self.n_regular = len(regular)
+        # Найбільша ширина кожного рівня 1..7 серед регулярних пропозицій (для рівня 0 не потрібна)
+        widths = -np.diff(self.thresholds[:, regular], axis=0)
+        self.band_widths = np.concatenate([[0.0], widths.max(axis=1) if len(regular) else np.zeros(7)])
+        avg_score = np.asarray(avg_score, dtype=float)
+        with_avg = np.flatnonzero(~np.isnan(avg_score))
+        self.avg_order = with_avg[np.argsort(avg_score[with_avg], kind='stable')]
+        self.sorted_avg = avg_score[self.avg_order]
+
+    def _passed(self, score):
+        """Кількість регулярних пропозицій, для яких бал >= межі кожного рівня 0..7."""
+        return np.array([np.searchsorted(sorted_threshold, score, side='right')
+                         for sorted_threshold in self.sorted_thresholds])
+
+    def _irregular_codes(self, score):
+        return classify_admission_chances(score, *self.thresholds[[5, 3, 0]][:, self.irregular])
+
+    def band_counts(self, score):
+        """Кількість пропозицій у кожному рівні шансів (довжина len(CHANCE_LABELS)) за O(log n)."""
+        counts = np.zeros(len(CHANCE_LABELS), dtype=np.int64)
+        if score is None:
+            counts[CHANCE_NO_APPLICANT_SCORE] = self.n_offers
+            return counts
+        passed = self._passed(score)
+        counts[:8] = np.diff(passed, prepend=0)
+        counts[8] = self.n_regular - passed[-1]
+        counts[CHANCE_NO_OFFER_DATA] = len(self.no_data)
+        if len(self.irregular):
+            counts += np.bincount(self._irregular_codes(score), minlength=len(CHANCE_LABELS))
+        return counts
+
+    def band(self, score, code):
+        """
+        Позиції пропозицій рівня `code` у зростаючому порядку. Кандидати - зріз між двома бінарними
+        пошуками, тож час - O(log n + кількість пропозицій, чия межа рівня нижча за бал не більше
+        ніж на найбільшу ширину рівня), а не весь префікс пропозицій, які бал перевищує.
+        """
+        if score is None:
+            return np.arange(self.n_offers) if code == CHANCE_NO_APPLICANT_SCORE else np.empty(0, dtype=np.int64)
+        if code == CHANCE_NO_OFFER_DATA:
+            return self.no_data
+        if code == 8:
+            positions = self.orders[-1][np.searchsorted(self.sorted_thresholds[-1], score, side='right'):]
+        elif 0 <= code < 8:
+            sorted_threshold = self.sorted_thresholds[code]
+            # Межа k-1 вища за межу k не більше ніж на ширину рівня, тож межа k > бал - ширина
+            start = np.searchsorted(sorted_threshold, score - self.band_widths[code], side='left') if code else 0
+            positions = self.orders[code][start:np.searchsorted(sorted_threshold, score, side='right')]
+            if code > 0:
+                # Бал >= межі k, але ще не досяг межі k-1
+                positions = positions[self.thresholds[code - 1][positions] > score]
+        else:
+            positions = np.empty(0, dtype=np.int64)
+        irregular = self.irregular[self._irregular_codes(score) == code]
+        return np.sort(np.concatenate([positions, irregular]))
+
+    def closest(self, score, k=10, mask=None):
+        """
+        Позиції k пропозицій із середнім балом, найближчим до `score` (від найближчої).
+        Два вказівники розходяться від місця бінарного пошуку; `mask` (bool за позиціями)
+        обмежує пошук пропозиціями, що пройшли фільтри.
+        """
+        if score is None:
+            return np.empty(0, dtype=np.int64)
+        right = int(np.searchsorted(self.sorted_avg, score))
+        left = right - 1
+        result = []
+        while len(result) < k and (left >= 0 or right < len(self.sorted_avg)):
+            take_left = right >= len(self.sorted_avg) or (
+                left >= 0 and score - self.sorted_avg[left] <= self.sorted_avg[right] - score)
+            if take_left:
+                position = self.avg_order[left]
+                left -= 1
+            else:
+                position = self.avg_order[right]
+                right += 1
+            if mask is None or mask[position]:
+                result.append(position)
+        return np.array(result, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return (self.thresholds.nbytes + sum(order.nbytes for order in self.orders)
+                + sum(threshold.nbytes for threshold in self.sorted_thresholds)
+                + self.avg_order.nbytes + self.sorted_avg.nbytes)
@@ -0,0 +1,277 @@
+"""
+Агрегати дашбордів page_2.py, що згортаються частинами даних.
+
+Для кожного виміру дашборду зберігаються лише кількості записів у розрізі
+(exam_year, regname, значення) - за цими двома колонками page_2 фільтрує дані, тож
+будь-який вибір фільтрів обчислюється сумою по збережених групах. Розмір агрегатів
+залежить від кількості груп, а не записів, тому потоковий режим читає Parquet
+групами рядків (або CSV частинами) і тримає в пам'яті лише одну частину.
+
+    python src/aggregates.py src/main_df.csv --chunksize 200000
+    python src/aggregates.py src/main_df.csv --output src/dashboard_aggregates
+
+З --output агрегати зберігаються як матеріалізовані таблиці (по одному Parquet на агрегат);
+page_2 відповідає на будь-який вибір фільтрів сумою їхніх рядків, не читаючи main_df.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bitmap_index import BitmapIndex
+from dataset import MAIN_DF_CSV, main_df_content_version, main_df_source
+
+FILTER_COLS = ['exam_year', 'regname']
+DIMENSION_COLS = ['sextypename', 'settlement_type', 'regname', 'regtypename']
+SOURCE_COLS = FILTER_COLS + ['sextypename', 'settlement_type', 'regtypename', 'testdate', 'birth']
+COUNT_COL = 'Кількість'
+DEFAULT_CHUNKSIZE = 200_000
+AGGREGATES_DIR = "src/dashboard_aggregates"
+MANIFEST_NAME = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+
+def _count(chunk, dimension=None):
+    """Кількість записів частини за (exam_year, regname[, dimension]); NaN у вимірі відкидається."""
+    keys = FILTER_COLS if dimension is None or dimension in FILTER_COLS else FILTER_COLS + [dimension]
+    counts = chunk.groupby(keys, observed=True, dropna=False).size().rename(COUNT_COL).reset_index()
+    if dimension is not None:
+        counts = counts[counts[dimension].notna()]
+    # Категорії різних частин мають різні словники - зводимо ключі до звичайних значень
+    for col in keys:
+        if isinstance(counts[col].dtype, pd.CategoricalDtype):
+            counts[col] = counts[col].astype(object)
+    return counts
+
+
+def chunk_aggregates(chunk):
+    """Агрегати однієї частини даних: {назва: кадр FILTER_COLS + вимір + COUNT_COL}."""
+    parts = {'rows': _count(chunk)}
+    for dimension in DIMENSION_COLS:
+        if dimension in chunk.columns:
+            parts[dimension] = _count(chunk, dimension)
+    if 'testdate' in chunk.columns:
+        testdate = pd.to_datetime(chunk['testdate'], errors='coerce')
+        parts['testdate'] = _count(chunk[FILTER_COLS].assign(testdate=testdate.dt.date), 'testdate')
+    if 'birth' in chunk.columns:
+        age = pd.to_numeric(chunk['exam_year'], errors='coerce') - pd.to_numeric(chunk['birth'], errors='coerce')
+        parts['age'] = _count(chunk[FILTER_COLS].assign(age=age), 'age').astype({'age': int})
+    return parts
+
+
+def fold(aggregates, parts):
+    """Додає агрегати частини `parts` до накопичених `aggregates`."""
+    for name, counts in parts.items():
+        if name in aggregates:
+            keys = [col for col in counts.columns if col != COUNT_COL]
+            counts = (pd.concat([aggregates[name], counts], ignore_index=True)
+                      .groupby(keys, dropna=False, sort=False)[COUNT_COL].sum().reset_index())
+        aggregates[name] = counts
+    return aggregates
+
+
+def _chunks(path, chunksize):
+    """Частини даних: групи рядків Parquet або частини CSV лише з потрібними колонками."""
+    if path.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(path)
+        columns = [col for col in SOURCE_COLS if col in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=lambda col: col in SOURCE_COLS, chunksize=chunksize)
+
+
+def stream_aggregates(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Потоково згортає файл `path` (Parquet або CSV) в агрегати дашбордів."""
+    aggregates = {}
+    for chunk in _chunks(path, chunksize):
+        fold(aggregates, chunk_aggregates(chunk))
+    return aggregates
+
+
+def select(aggregates, exam_years=None, regions=None):
+    """Агрегати лише для обраних років та регіонів (порожній вибір - без фільтра)."""
+    selected = {}
+    for name, counts in aggregates.items():
+        mask = pd.Series(True, index=counts.index)
+        if exam_years:
+            mask &= counts['exam_year'].isin(exam_years)
+        if regions:
+            mask &= counts['regname'].isin(regions)
+        selected[name] = counts[mask]
+    return selected
+
+
+def counts_by(counts, keys):
+    """Сума кількостей за колонками `keys` (як groupby(keys).size() по сирих записах)."""
+    return counts.groupby(keys, sort=False)[COUNT_COL].sum().reset_index()
+
+
+class FoldedAggregates:
+    """Агрегати, згорнуті з файлу; вибір фільтрів сумує їхні групи."""
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def select(self, exam_years=None, regions=None):
+        return select(self.totals, exam_years, regions)
+
+
+def write_aggregates(aggregates, source_version, output_dir=AGGREGATES_DIR):
+    """
+    Зберігає агрегати як матеріалізовані таблиці. Маніфест з версією джерела записується
+    останнім, тож читачі ніколи не бачать напівзаписаного набору таблиць.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    for name, counts in aggregates.items():
+        path = os.path.join(output_dir, f"{name}.parquet")
+        counts.to_parquet(path + suffix, index=False)
+        os.replace(path + suffix, path)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + suffix, 'w', encoding='utf-8') as manifest_file:
+        json.dump({'source_version': source_version, 'tables': list(aggregates)}, manifest_file, ensure_ascii=False)
+    os.replace(manifest_path + suffix, manifest_path)
+    return output_dir
+
+
+def has_aggregates(output_dir=AGGREGATES_DIR):
+    """Чи є в `output_dir` матеріалізовані таблиці (будь-якої версії)."""
+    return os.path.exists(os.path.join(output_dir, MANIFEST_NAME))
+
+
+def read_aggregates(source_version, output_dir=AGGREGATES_DIR):
+    """
+    Матеріалізовані таблиці, якщо вони побудовані з джерела версії `source_version`
+    (main_df_content_version), інакше None - застарілі таблиці ігноруються з попередженням у лозі.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('source_version') != source_version:
+        logger.warning("Матеріалізовані агрегати в %s побудовані з іншої версії main_df (%s, поточна %s) "
+                       "і ігноруються; перебудуйте їх: python src/aggregates.py --output %s",
+                       output_dir, manifest.get('source_version'), source_version, output_dir)
+        return None
+    aggregates = {name: pd.read_parquet(os.path.join(output_dir, f"{name}.parquet")) for name in manifest['tables']}
+    # Дати повертаються з Parquet як datetime64 - зводимо до днів, як у chunk_aggregates
+    if 'testdate' in aggregates:
+        aggregates['testdate']['testdate'] = pd.to_datetime(aggregates['testdate']['testdate']).dt.date
+    return aggregates
+
+
+def _dimension_values(frame):
+    """Значення вимірів агрегатів для кожного рядка кадру (назва агрегату -> серія)."""
+    values = {name: frame[name] for name in DIMENSION_COLS if name in frame.columns}
+    if 'testdate' in frame.columns:
+        values['testdate'] = pd.to_datetime(frame['testdate'], errors='coerce').dt.date
+    if 'birth' in frame.columns:
+        values['age'] = pd.to_numeric(frame['exam_year'], errors='coerce') - pd.to_numeric(frame['birth'], errors='coerce')
+    return values
+
+
+class IndexedAggregates:
+    """
+    Агрегати спільного main_df, що рахуються для будь-якого вибору без відфільтрованого кадру:
+    бітові індекси (bitmap_index.py) дають номери вибраних рядків, а кількості - це
+    np.bincount закодованих значень (exam_year, regname, вимір) лише в цих рядках.
+    """
+
+    def __init__(self, frame):
+        self.index = BitmapIndex(frame, FILTER_COLS)
+        self._codes = {}
+        for name, values in [(col, frame[col]) for col in FILTER_COLS] + list(_dimension_values(frame).items()):
+            codes, uniques = pd.factorize(values, sort=True)
+            # Код 0 зарезервовано для NaN, щоб рядки без значення ключа теж рахувались
+            self._codes[name] = ((codes + 1).astype(np.int32), np.concatenate([[np.nan], uniques.to_numpy(dtype=object)]))
+        self.totals = self._aggregates(None)
+
+    def _count(self, positions, dimension=None):
+        keys = FILTER_COLS if dimension is None or dimension in FILTER_COLS else FILTER_COLS + [dimension]
+        combined = np.zeros(1 if positions is None else len(positions), dtype=np.int64)
+        radices = []
+        for key in keys:
+            codes, uniques = self._codes[key]
+            combined = combined * len(uniques) + (codes if positions is None else codes[positions])
+            radices.append(len(uniques))
+        counts = np.bincount(combined, minlength=int(np.prod(radices)))
+        occupied = np.flatnonzero(counts)
+        columns = {}
+        for key, radix in zip(reversed(keys), reversed(radices)):
+            occupied_codes = occupied % radix
+            occupied = occupied // radix
+            columns[key] = self._codes[key][1][occupied_codes]
+        result = pd.DataFrame({key: columns[key] for key in keys})
+        result[COUNT_COL] = counts[counts > 0]
+        if dimension is not None:
+            result = result[result[dimension].notna()]
+        result = result.infer_objects()
+        if dimension == 'age':
+            result['age'] = result['age'].astype(int)
+        return result.reset_index(drop=True)
+
+    def _aggregates(self, positions):
+        parts = {'rows': self._count(positions)}
+        for name in self._codes:
+            if name not in FILTER_COLS or name == 'regname':
+                parts[name] = self._count(positions, name)
+        return parts
+
+    def select(self, exam_years=None, regions=None):
+        selected = self.index.select({'exam_year': exam_years, 'regname': regions})
+        if selected is None:
+            return self.totals
+        return self._aggregates(selected.to_positions())
+
+
+def count_quantiles(values, counts, quantiles):
+    """Квантилі (лінійна інтерполяція, як numpy.percentile) значень `values` з кратностями `counts`."""
+    order = values.argsort()
+    values, cumulative = values[order], counts[order].cumsum()
+    total = cumulative[-1]
+    result = []
+    for q in quantiles:
+        position = (total - 1) * q
+        lower, upper = int(position), min(int(position) + 1, total - 1)
+        value_lower = values[cumulative.searchsorted(lower, side='right')]
+        value_upper = values[cumulative.searchsorted(upper, side='right')]
+        result.append(value_lower + (value_upper - value_lower) * (position - lower))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потокова побудова агрегатів дашбордів page_2.")
+    parser.add_argument("path", nargs="?", default=MAIN_DF_CSV,
+                        help="main_df.csv (читається актуальна Parquet-копія поруч, якщо вона є)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--output", help=f"каталог для матеріалізованих таблиць (напр., {AGGREGATES_DIR})")
+    args = parser.parse_args(argv)
+
+    # Джерело визначається так само, як у page_2: таблиці позначаються версією вмісту логічного main_df
+    csv_path = os.path.splitext(args.path)[0] + '.csv'
+    source_path, _ = main_df_source(csv_path)
+    start = time.perf_counter()
+    aggregates = stream_aggregates(source_path, args.chunksize)
+    seconds = time.perf_counter() - start
+    rows = int(aggregates['rows'][COUNT_COL].sum())
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{rows:,} записів за {seconds:.2f} с, частина {args.chunksize:,} рядків, "
+          f"пікова пам'ять процесу {peak_mb:,.0f} МБ")
+    for name, counts in aggregates.items():
+        print(f"  {name}: {len(counts):,} груп")
+    if args.output:
+        print(f"Записано {write_aggregates(aggregates, main_df_content_version(csv_path), args.output)}")
+
+
+if __name__ == "__main__":
+    main()
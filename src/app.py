@@ -1,8 +1,17 @@
+import os
+
 import streamlit as st
 from dotenv import load_dotenv
 
+from artifacts import prefetch_artifacts
+from telemetry import rerun
+
 load_dotenv()
 
+# У 'prod' дані та моделі завантажуються з S3 паралельно у фоні, поки рендериться перша сторінка
+if 'prod' in os.environ['ENVIROMENT_MODE']:
+    prefetch_artifacts()
+
 main_page = st.Page('main_page.py', title = 'Головна', icon = '🏠')
 page_1 = st.Page('page_1.py', title = '🧮 Калькулятор НМТ та Аналіз Шансів на Вступ 🎓', icon = '📄')
 page_2 = st.Page('page_2.py', title = '🚀 Аналітичні дашборди на основі даних тестування', icon = '📈')
@@ -11,5 +20,7 @@ page_4 = st.Page('page_3.py', title = 'Про нас', icon = '👥')
 
 pg = st.navigation([main_page, page_1, page_2, page_3, page_4])
 
-pg.run()
+# Кожен перезапуск сторінки - один запис таймінгів (telemetry.py)
+with rerun(pg.url_path or 'main_page'):
+    pg.run()
 
@@ -0,0 +1,192 @@
+"""
+Завантаження артефактів застосунку (дані, моделі) з S3 у 'prod'.
+
+Кожен об'єкт спершу перевіряється запитом head_object: якщо у локальному кеші вже є
+файл з тим самим ETag і розміром, завантаження пропускається. Кеш адресується вмістом
+(`<ETag>-<розмір>`), файли в ньому з'являються лише через атомарний os.replace,
+а шлях у `src/`, який читають сторінки, - жорстке посилання (або копія) на файл кешу.
+Кілька артефактів завантажуються паралельно пулом потоків; повторний запит того самого
+артефакту під час завантаження чекає на вже запущене завантаження.
+
+Замість boto3-клієнта можна передати будь-який об'єкт з методами head_object та
+download_file, напр. LocalObjectStore - каталог, що імітує бакет.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BUCKET = "nmt"
+ARTIFACT_CACHE_DIR = "src/.artifact_cache"
+
+# Ключ об'єкта в бакеті -> шлях, за яким його читає застосунок
+ARTIFACTS = {
+    "main_df.csv": "src/main_df.csv",
+    "konkurs_NMT.csv": "src/konkurs_NMT.csv",
+    "lgbm_model_new.pkl": "src/lgbm_model_new.pkl",
+    "lgbm_model_math.pkl": "src/lgbm_model_math.pkl",
+    "lgbm_model_hist.pkl": "src/lgbm_model_hist.pkl",
+}
+
+
+class IntegrityError(OSError):
+    """Завантажений файл не відповідає ETag/розміру з head_object."""
+
+
+def _md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as artifact_file:
+        for block in iter(lambda: artifact_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LocalObjectStore:
+    """Каталог `root/<bucket>/<key>` з тим самим інтерфейсом, що й boto3-клієнт S3."""
+
+    def __init__(self, root):
+        self.root = root
+        self.downloads = 0
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"s3://{Bucket}/{Key}")
+        # ETag S3 для об'єкта, завантаженого одним запитом, - MD5 вмісту в лапках
+        return {'ETag': f'"{_md5(path)}"', 'ContentLength': os.path.getsize(path)}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.downloads += 1
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+
+class ArtifactFetcher:
+    """Паралельне завантаження артефактів з перевіркою ETag/розміру та кешем за вмістом."""
+
+    def __init__(self, client=None, bucket=BUCKET, cache_dir=ARTIFACT_CACHE_DIR, max_workers=4):
+        self._client = client
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-fetch")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        S3-клієнт, створений при першому використанні. Перше звернення відбувається одночасно
+        в кількох потоках пулу, а сесія boto3 за замовчуванням не потокобезпечна, тож клієнт
+        створюється під блокуванням з окремої сесії.
+        """
+        with self._lock:
+            if self._client is None:
+                import boto3
+                self._client = boto3.session.Session().client('s3')
+            return self._client
+
+    def _cache_path(self, etag, size):
+        return os.path.join(self.cache_dir, f"{etag}-{size}")
+
+    def _download(self, key, cache_path, etag, size):
+        """Завантажує об'єкт у тимчасовий файл кешу, перевіряє його і атомарно публікує."""
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self.client.download_file(self.bucket, key, tmp_path)
+            if os.path.getsize(tmp_path) != size:
+                raise IntegrityError(f"{key}: очікувалось {size} байт, отримано {os.path.getsize(tmp_path)}")
+            # ETag багаточастинного завантаження ('...-N') не є MD5 вмісту - тоді перевіряємо лише розмір
+            if '-' not in etag and _md5(tmp_path) != etag:
+                raise IntegrityError(f"{key}: вміст не відповідає ETag {etag}")
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _publish(self, cache_path, dest):
+        """Атомарно замінює `dest` посиланням на файл кешу (або його копією на іншій ФС)."""
+        if os.path.exists(dest) and os.path.samefile(cache_path, dest):
+            return
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(cache_path, tmp_path)
+        except OSError:
+            shutil.copy2(cache_path, tmp_path)
+        os.replace(tmp_path, dest)
+
+    def _fetch(self, key, dest):
+        head = self.client.head_object(Bucket=self.bucket, Key=key)
+        etag, size = head['ETag'].strip('"'), int(head['ContentLength'])
+        cache_path = self._cache_path(etag, size)
+        if not (os.path.exists(cache_path) and os.path.getsize(cache_path) == size):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._download(key, cache_path, etag, size)
+        dest_dir = os.path.dirname(dest)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        self._publish(cache_path, dest)
+        return dest
+
+    def fetch_async(self, key, dest=None):
+        """Запускає (або повертає вже запущене) завантаження `key`; повертає Future з шляхом."""
+        dest = dest if dest is not None else ARTIFACTS[key]
+        with self._lock:
+            future = self._inflight.get(dest)
+            if future is not None:
+                return future
+            future = self._pool.submit(self._fetch, key, dest)
+            self._inflight[dest] = future
+        # Поза блокуванням: якщо завантаження вже завершилось, колбек виконується одразу і бере _lock
+        future.add_done_callback(lambda done, dest=dest: self._forget(dest, done))
+        return future
+
+    def _forget(self, dest, future):
+        with self._lock:
+            if self._inflight.get(dest) is future:
+                del self._inflight[dest]
+
+    def fetch(self, key, dest=None):
+        """Завантажує один артефакт (якщо потрібно) і повертає локальний шлях."""
+        return self.fetch_async(key, dest).result()
+
+    def fetch_many(self, keys):
+        """Паралельно завантажує кілька артефактів: {key: локальний шлях}."""
+        futures = {key: self.fetch_async(key) for key in keys}
+        return {key: future.result() for key, future in futures.items()}
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    """Спільний для процесу завантажувач (S3-клієнт створюється при першому використанні)."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ArtifactFetcher()
+        return _default_fetcher
+
+
+def fetch_artifact(dest):
+    """Завантажує артефакт, який застосунок читає за шляхом `dest` (ключ у бакеті - ім'я файлу)."""
+    return get_fetcher().fetch(os.path.basename(dest), dest)
+
+
+_prefetched = None
+
+def prefetch_artifacts(keys=tuple(ARTIFACTS)):
+    """
+    Один раз на процес запускає фонове паралельне завантаження артефактів, не чекаючи
+    на результат; сторінки, яким артефакт потрібен раніше, приєднуються до завантаження.
+    """
+    global _prefetched
+    with _default_fetcher_lock:
+        if _prefetched is None:
+            _prefetched = keys
+        else:
+            return []
+    fetcher = get_fetcher()
+    return [fetcher.fetch_async(key) for key in keys]
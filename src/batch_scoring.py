@@ -0,0 +1,100 @@
+"""
+Пакетний розрахунок балів НМТ для когорти абітурієнтів (без інтерфейсу Streamlit).
+
+Вхідний CSV містить колонки FEATURE_COLS та шкільні оцінки `o12_<key>` для кожного
+предмету з SUBJECTS_CONFIG (напр., `o12_math`). Файл читається частинами, кожна модель
+викликається один раз на частину, а результати дописуються у вихідний CSV.
+
+    python src/batch_scoring.py cohort.csv scores.csv --chunksize 10000
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from scoring import (SUBJECTS_CONFIG, FEATURE_COLS, MultiSubjectPredictor, get_model, calculate_score_balanced,
+                     calculate_score_individual_adjusted, calculate_score_cautious_stress)
+
+
+def load_models(subject_config=SUBJECTS_CONFIG):
+    """Завантажує моделі всіх предметів; повертає MultiSubjectPredictor з моделями {key: модель}."""
+    return MultiSubjectPredictor({config["key"]: get_model(config["key"], subject_config)
+                                  for config in subject_config.values()})
+
+
+def required_columns(subject_keys):
+    """Колонки вхідного CSV: ознаки моделей та шкільні оцінки o12_<key> предметів `subject_keys`."""
+    return FEATURE_COLS + [f"o12_{key}" for key in subject_keys]
+
+
+def score_frame(df, models, w=0.5, k_stress=1.0):
+    """
+    Розраховує бали для всіх рядків `df`: прогноз кожної моделі та три формули
+    (Баланс, Індивідуальний, Обережний), середнє з предмету та загальний середній бал.
+    Ознаки кодуються один раз для всіх моделей зі спільною підготовкою (MultiSubjectPredictor).
+    """
+    predictor = models if isinstance(models, MultiSubjectPredictor) else MultiSubjectPredictor(models)
+    predictions = predictor.predict(df[FEATURE_COLS])
+    result = pd.DataFrame(index=df.index)
+    subject_averages = []
+    for subject_key, predicted in predictions.items():
+        grade = pd.to_numeric(df[f"o12_{subject_key}"], errors='coerce').to_numpy(dtype=float)
+        score_1 = calculate_score_balanced(predicted, grade, w)
+        score_2 = calculate_score_individual_adjusted(predicted, grade)
+        score_3 = calculate_score_cautious_stress(predicted, grade, k_stress)
+        subject_average = (score_1 + score_2 + score_3) / 3
+        result[f"pred_{subject_key}"] = predicted
+        result[f"balanced_{subject_key}"] = score_1
+        result[f"individual_{subject_key}"] = score_2
+        result[f"cautious_{subject_key}"] = score_3
+        result[f"avg_{subject_key}"] = subject_average
+        subject_averages.append(subject_average)
+    result["total"] = sum(subject_averages) / len(subject_averages)
+    return result
+
+
+def score_file(input_path, output_path, models, chunksize=10_000, w=0.5, k_stress=1.0,
+               keep_columns=(), log=sys.stderr):
+    """
+    Потоково обробляє `input_path` частинами по `chunksize` рядків і дописує результати
+    у `output_path`. Повертає (кількість абітурієнтів, секунди).
+    """
+    subject_keys = models.models if isinstance(models, MultiSubjectPredictor) else models
+    required = required_columns(subject_keys)
+    usecols = list(dict.fromkeys(list(keep_columns) + required))
+    total_rows = 0
+    start = time.perf_counter()
+    reader = pd.read_csv(input_path, usecols=usecols, chunksize=chunksize)
+    for chunk_number, chunk in enumerate(reader):
+        scored = score_frame(chunk, models, w=w, k_stress=k_stress)
+        if keep_columns:
+            scored = pd.concat([chunk[list(keep_columns)], scored], axis=1)
+        scored.to_csv(output_path, mode='w' if chunk_number == 0 else 'a',
+                      header=chunk_number == 0, index=False)
+        total_rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        if log is not None:
+            print(f"оброблено {total_rows:,} абітурієнтів, {total_rows / elapsed:,.0f} абітурієнтів/с", file=log)
+    return total_rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетний розрахунок приблизних балів НМТ з CSV.")
+    parser.add_argument("input", help="CSV з колонками ознак та o12_<предмет>")
+    parser.add_argument("output", help="куди записати результати (CSV)")
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    parser.add_argument("--w", type=float, default=0.5, help="вага прогнозу моделі у формулі 'Баланс'")
+    parser.add_argument("--k-stress", type=float, default=1.0, help="фактор стресу для 'Обережний прогноз'")
+    parser.add_argument("--keep", nargs="*", default=[], help="колонки вхідного файлу, які скопіювати у результат")
+    args = parser.parse_args(argv)
+
+    models = load_models()
+    rows, seconds = score_file(args.input, args.output, models, chunksize=args.chunksize,
+                               w=args.w, k_stress=args.k_stress, keep_columns=args.keep)
+    rate = rows / seconds if seconds else float('inf')
+    print(f"Готово: {rows:,} абітурієнтів за {seconds:.2f} с ({rate:,.0f} абітурієнтів/с) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
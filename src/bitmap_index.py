@@ -0,0 +1,165 @@
+"""
+Стиснені бітові індекси рядків (у стилі Roaring) для фільтрів-мультиселектів.
+
+Номери рядків діляться на блоки по 2^16 за старшими бітами. Рядки одного значення
+в кожному блоці зберігаються контейнером: відсортованим масивом uint16 молодших бітів,
+якщо їх небагато (до ARRAY_MAX_CARDINALITY), або бітовою картою з 1024 слів uint64.
+Вибір у мультиселекті - OR бітових карт значень колонки, вибір кількох колонок - AND.
+"""
+import numpy as np
+import pandas as pd
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+BITMAP_WORDS = CHUNK_SIZE // 64
+# Поріг Roaring: масив з 4096 значень uint16 займає стільки ж, скільки бітова карта (8 КБ)
+ARRAY_MAX_CARDINALITY = 4096
+
+
+def _array_to_words(low):
+    bits = np.zeros(CHUNK_SIZE, dtype=bool)
+    bits[low] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+
+def _words_to_array(words):
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+
+def _container(low):
+    """Контейнер для відсортованих молодших бітів блоку: масив або бітова карта."""
+    if len(low) <= ARRAY_MAX_CARDINALITY:
+        return low.astype(np.uint16)
+    return _array_to_words(low)
+
+
+def _is_bitmap(container):
+    return container.dtype == np.uint64
+
+
+def _as_words(container):
+    return container if _is_bitmap(container) else _array_to_words(container)
+
+
+def _compact(words):
+    """Бітова карта -> контейнер меншого розміру (або None, якщо блок порожній)."""
+    cardinality = int(np.unpackbits(words.view(np.uint8)).sum())
+    if cardinality == 0:
+        return None
+    if cardinality <= ARRAY_MAX_CARDINALITY:
+        return _words_to_array(words)
+    return words
+
+
+def _and_containers(left, right):
+    if not _is_bitmap(left) and not _is_bitmap(right):
+        result = np.intersect1d(left, right, assume_unique=True)
+        return result if len(result) else None
+    if not _is_bitmap(left) or not _is_bitmap(right):
+        array, words = (left, right) if not _is_bitmap(left) else (right, left)
+        bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+        result = array[bits[array].astype(bool)]
+        return result if len(result) else None
+    return _compact(left & right)
+
+
+class RoaringBitmap:
+    """Множина номерів рядків: {старші біти блоку: контейнер молодших бітів}."""
+
+    def __init__(self, containers=None):
+        self.containers = containers if containers is not None else {}
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Бітова карта з відсортованих номерів рядків."""
+        positions = np.asarray(positions, dtype=np.int64)
+        high = positions >> CHUNK_BITS
+        keys, starts = np.unique(high, return_index=True)
+        bounds = np.append(starts, len(positions))
+        low = (positions & (CHUNK_SIZE - 1)).astype(np.uint16)
+        return cls({int(key): _container(low[start:end])
+                    for key, start, end in zip(keys, bounds[:-1], bounds[1:])})
+
+    @classmethod
+    def union(cls, bitmaps):
+        """OR кількох бітових карт."""
+        bitmaps = list(bitmaps)
+        if len(bitmaps) == 1:
+            return bitmaps[0]
+        merged = {}
+        for bitmap in bitmaps:
+            for key, container in bitmap.containers.items():
+                merged.setdefault(key, []).append(container)
+        containers = {}
+        for key, parts in merged.items():
+            if len(parts) == 1:
+                containers[key] = parts[0]
+            elif all(not _is_bitmap(part) for part in parts) and sum(map(len, parts)) <= ARRAY_MAX_CARDINALITY:
+                containers[key] = np.unique(np.concatenate(parts))
+            else:
+                containers[key] = _compact(np.bitwise_or.reduce([_as_words(part) for part in parts]))
+        return cls(containers)
+
+    def __and__(self, other):
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            container = _and_containers(self.containers[key], other.containers[key])
+            if container is not None:
+                containers[key] = container
+        return RoaringBitmap(containers)
+
+    def __len__(self):
+        return sum(int(np.unpackbits(container.view(np.uint8)).sum()) if _is_bitmap(container) else len(container)
+                   for container in self.containers.values())
+
+    def to_positions(self):
+        """Номери рядків у зростаючому порядку (int64)."""
+        parts = []
+        for key in sorted(self.containers):
+            container = self.containers[key]
+            low = _words_to_array(container) if _is_bitmap(container) else container
+            parts.append((np.int64(key) << CHUNK_BITS) + low.astype(np.int64))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return sum(container.nbytes for container in self.containers.values())
+
+
+class BitmapIndex:
+    """Бітові карти рядків для кожного значення колонок-фільтрів."""
+
+    def __init__(self, frame, columns):
+        self.n_rows = len(frame)
+        self.bitmaps = {}
+        for column in columns:
+            codes, uniques = pd.factorize(frame[column], sort=True)
+            # Рядки, згруповані за значенням; усередині групи номери зростають (стабільне сортування)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.bitmaps[column] = {
+                value: RoaringBitmap.from_positions(order[start:end])
+                for value, start, end in zip(uniques.tolist(), bounds[:-1], bounds[1:])
+            }
+
+    def values(self, column):
+        return list(self.bitmaps[column])
+
+    def select(self, selection):
+        """
+        Бітова карта рядків для вибору {колонка: список значень}: OR значень у колонці,
+        AND між колонками. Порожній список - без фільтра; None - вибрано всі рядки.
+        """
+        result = None
+        for column, values in selection.items():
+            if not values:
+                continue
+            bitmaps = self.bitmaps[column]
+            column_bitmap = RoaringBitmap.union([bitmaps[value] for value in values if value in bitmaps] or
+                                                [RoaringBitmap()])
+            result = column_bitmap if result is None else result & column_bitmap
+        return result
+
+    @property
+    def nbytes(self):
+        return sum(bitmap.nbytes for bitmaps in self.bitmaps.values() for bitmap in bitmaps.values())
@@ -0,0 +1,65 @@
+"""
+Plotly-графіки, що будуються з підсумків на сервері.
+
+У браузер передаються лише кількості за кошиками гістограми та п'ять чисел бокс-плоту,
+а не окремі значення, тож розмір JSON фігури не залежить від кількості записів.
+"""
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from aggregates import count_quantiles
+
+
+def count_bins(values, counts, nbins=30):
+    """
+    Кошики гістограми цілих значень з кратностями: ліві межі, ширина кошика та кількості.
+    Ширина - ціле число, щоб кожне значення потрапляло рівно в один кошик.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    low, high = int(values.min()), int(values.max())
+    width = max(1, int(np.ceil((high - low + 1) / nbins)))
+    bin_counts = np.bincount((values - low) // width, weights=counts).astype(np.int64)
+    return low + width * np.arange(len(bin_counts)), width, bin_counts
+
+
+def box_summary(values, counts, whis=1.5):
+    """П'ять чисел бокс-плоту (як у plotly: вуса - крайні значення в межах whis * IQR) та викиди."""
+    values = np.asarray(values)
+    q1, median, q3 = count_quantiles(values, np.asarray(counts), [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = (values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)
+    return {
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': values[inside].min(), 'upperfence': values[inside].max(),
+        'outliers': np.unique(values[~inside]),
+    }
+
+
+def histogram_with_box(values, counts, x_title, y_title, title, nbins=30):
+    """Гістограма з бокс-плотом над нею (як px.histogram(..., marginal='box')) з підсумків."""
+    starts, width, bin_counts = count_bins(values, counts, nbins)
+    summary = box_summary(values, counts)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    fig.add_trace(go.Box(q1=[summary['q1']], median=[summary['median']], q3=[summary['q3']],
+                         lowerfence=[summary['lowerfence']], upperfence=[summary['upperfence']],
+                         y=[x_title], orientation='h', name=x_title, showlegend=False), row=1, col=1)
+    if len(summary['outliers']):
+        fig.add_trace(go.Scatter(x=summary['outliers'], y=[x_title] * len(summary['outliers']), mode='markers',
+                                 name='Викиди', showlegend=False), row=1, col=1)
+    # Кошик [start, start + width) показуємо стовпчиком з центром посередині, як у гістограмі plotly
+    fig.add_trace(go.Bar(x=starts + (width - 1) / 2, y=bin_counts, width=width, name=x_title, showlegend=False,
+                         hovertemplate=f"{x_title}: %{{customdata}}<br>{y_title}: %{{y}}<extra></extra>",
+                         customdata=[f"{start}-{start + width - 1}" if width > 1 else str(start) for start in starts]),
+                  row=2, col=1)
+    fig.update_layout(title=title, bargap=0)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_xaxes(title_text=x_title, row=2, col=1)
+    fig.update_yaxes(title_text=y_title, row=2, col=1)
+    return fig
+
+
+def figure_json_bytes(fig):
+    """Розмір JSON фігури, який Streamlit передає в браузер."""
+    return len(fig.to_json().encode('utf-8'))
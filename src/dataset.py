@@ -0,0 +1,238 @@
+import argparse
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from artifacts import fetch_artifact
+from shared_store import content_version, default_store, version_key
+from telemetry import cache_miss
+
+# Copy-on-Write: фільтри та вибірки колонок повертають представлення спільного кадру,
+# а будь-яка спроба змінити їх створює локальну копію замість зміни спільних даних.
+pd.set_option("mode.copy_on_write", True)
+
+MAIN_DF_CSV = "src/main_df.csv"
+MAIN_DF_PARQUET = "src/main_df.parquet"
+MAIN_DF_STORE_NAME = "main_df"
+
+# Компактна схема main_df, що застосовується при кожному завантаженні.
+# Текстові колонки мають небагато різних значень - категорії (коди int8/int16 замість рядків
+# Python), роки - int16, бали ball100 (100-200, NaN якщо предмет не складався) - float32.
+TEXT_COLS = ['sextypename', 'regname', 'settlement_type', 'settlement_name', 'eoname',
+             'eotypename', 'regtypename', 'ptregname']
+YEAR_COLS = ['exam_year', 'birth']
+BALL_COLS = ['ukrball100', 'histball100', 'mathball100']
+MAIN_DF_SCHEMA = {
+    **{col: 'int16' for col in YEAR_COLS},
+    **{col: 'category' for col in TEXT_COLS},
+    'testdate': 'datetime64[ns]',
+    **{col: 'float32' for col in BALL_COLS},
+}
+
+
+def _is_fresh(parquet_path, csv_path):
+    """Parquet-копія актуальна, якщо вона існує і не старша за CSV."""
+    if not os.path.exists(parquet_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def apply_schema(df, schema=MAIN_DF_SCHEMA):
+    """
+    Приводить колонки `df`, описані в `schema`, до компактних типів; решта колонок не змінюється.
+    Рік з пропусками зберігається як float32 з NaN, некоректні бали та дати стають NaN/NaT.
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        elif dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        else:
+            values = pd.to_numeric(df[col], errors='coerce')
+            if pd.api.types.is_integer_dtype(dtype) and values.isna().any():
+                dtype = 'float32'
+            df[col] = values.astype(dtype)
+    return df
+
+
+def read_main_df_csv(csv_path=MAIN_DF_CSV, columns=None):
+    """Резервний шлях: читає CSV (текстові колонки одразу як категорії) і застосовує схему."""
+    df = pd.read_csv(csv_path, usecols=columns, dtype={col: 'category' for col in TEXT_COLS})
+    return apply_schema(df)
+
+
+def memory_report(df, baseline=None):
+    """
+    Пам'ять кожної колонки `df` (з урахуванням рядків усередині object-колонок), рядок 'Усього'
+    в кінці. Якщо задано `baseline` (напр., той самий CSV з типами pandas за замовчуванням),
+    поруч показуються його типи, пам'ять та у скільки разів вона більша.
+    """
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': df.memory_usage(index=False, deep=True)})
+    if baseline is not None:
+        report['baseline_dtype'] = baseline.dtypes.astype(str)
+        report['baseline_bytes'] = baseline.memory_usage(index=False, deep=True)
+    total = report.select_dtypes('number').sum().to_frame('Усього').T
+    report = pd.concat([report, total]).fillna({'dtype': '', 'baseline_dtype': ''})
+    if baseline is not None:
+        report['ratio'] = (report['baseline_bytes'] / report['bytes']).round(1)
+    return report
+
+
+def convert_csv_to_parquet(csv_path=MAIN_DF_CSV, parquet_path=MAIN_DF_PARQUET):
+    """
+    Одноразово перетворює CSV у типізований Parquet з типами MAIN_DF_SCHEMA: 'testdate'
+    зберігається як дата, а текстові колонки - зі словниковим кодуванням.
+    """
+    df = read_main_df_csv(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    # Кілька процесів можуть перетворювати застарілий CSV одночасно - у кожного свій тимчасовий файл
+    tmp_path = f"{parquet_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        pq.write_table(table, tmp_path, use_dictionary=True, compression="zstd")
+        os.replace(tmp_path, parquet_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return parquet_path
+
+
+def read_main_df(columns=None, csv_path=MAIN_DF_CSV, parquet_path=MAIN_DF_PARQUET):
+    """
+    Завантажує main_df з Parquet (лише потрібні колонки `columns`), а якщо
+    актуальної Parquet-копії немає - з CSV. Колонки приводяться до MAIN_DF_SCHEMA.
+    """
+    if _is_fresh(parquet_path, csv_path):
+        schema = pq.read_schema(parquet_path)
+        dictionary_cols = [field.name for field in schema
+                           if pa.types.is_dictionary(field.type)
+                           or pa.types.is_string(field.type)]
+        table = pq.read_table(parquet_path, columns=columns, read_dictionary=dictionary_cols)
+        # Parquet, записаний до появи схеми, містить int64/float64 - приводимо при читанні
+        return apply_schema(table.to_pandas())
+    return read_main_df_csv(csv_path, columns=columns)
+
+
+class MainDataset:
+    """Єдиний на процес екземпляр main_df, спільний для всіх сторінок і сесій."""
+
+    def __init__(self, frame, version):
+        self._frame = frame
+        self.version = version
+
+    @property
+    def frame(self):
+        """Базовий кадр; сторінки фільтрують його без .copy()."""
+        return self._frame
+
+    def __len__(self):
+        return len(self._frame)
+
+
+def _dataset_version(csv_path, parquet_path):
+    path = parquet_path if _is_fresh(parquet_path, csv_path) else csv_path
+    stat = os.stat(path)
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+def main_df_source(csv_path=MAIN_DF_CSV):
+    """Файл, з якого читатиметься main_df (актуальний Parquet або CSV), та його версія."""
+    version = _dataset_version(csv_path, os.path.splitext(csv_path)[0] + '.parquet')
+    return version[0], version
+
+
+def prepare_main_df(file_path=MAIN_DF_CSV):
+    """Перевіряє наявність main_df і за потреби оновлює Parquet-копію; повертає шлях до неї."""
+    parquet_path = os.path.splitext(file_path)[0] + '.parquet'
+    if not os.path.exists(file_path) and not os.path.exists(parquet_path):
+        raise FileNotFoundError(file_path)
+    if not _is_fresh(parquet_path, file_path):
+        # Свіжий CSV (напр., щойно завантажений з S3) перетворюємо один раз для наступних процесів
+        try:
+            convert_csv_to_parquet(file_path, parquet_path)
+        except OSError:
+            pass
+    return parquet_path
+
+
+def shared_main_df(store, file_path=MAIN_DF_CSV):
+    """
+    main_df зі сховища хоста (shared_store), відображений у пам'ять без копіювання.
+    Версія сховища визначається версією файлу-джерела та схемою; якщо вона застаріла,
+    main_df читається і публікується один раз на хост.
+    """
+    parquet_path = prepare_main_df(file_path)
+    version = version_key(_dataset_version(file_path, parquet_path), MAIN_DF_SCHEMA)
+    return store.load(MAIN_DF_STORE_NAME, version,
+                      lambda: read_main_df(csv_path=file_path, parquet_path=parquet_path))
+
+
+def main_df_content_version(csv_path=MAIN_DF_CSV):
+    """
+    Версія вмісту логічного джерела main_df: CSV (Parquet - похідна копія), а якщо CSV
+    немає - Parquet. Не залежить від шляху та mtime, тож збігається на різних хостах.
+    """
+    path = csv_path if os.path.exists(csv_path) else os.path.splitext(csv_path)[0] + '.parquet'
+    return content_version(path)
+
+
+@st.cache_resource
+def _fetch_main_df(file_path):
+    """Один раз на процес оновлює main_df з S3 (у 'prod')."""
+    if 'prod' in os.environ['ENVIROMENT_MODE']:
+        fetch_artifact(file_path)
+
+
+@st.cache_resource(show_spinner="Завантаження даних тестування...", max_entries=1)
+def _open_main_dataset(file_path, version):
+    """
+    Один екземпляр main_df на процес для кожної версії даних; попередня версія (та її
+    відображення в пам'ять) витісняється з кешу, щойно завантажено нову.
+    """
+    cache_miss()
+    store = default_store()
+    if store is not None:
+        try:
+            return MainDataset(shared_main_df(store, file_path), version)
+        except OSError:
+            # Сховище недоступне для запису - читаємо власну копію процесу
+            pass
+    parquet_path = prepare_main_df(file_path)
+    return MainDataset(read_main_df(csv_path=file_path, parquet_path=parquet_path), version)
+
+
+def load_main_dataset(file_path=MAIN_DF_CSV):
+    """
+    Повертає спільний main_df (MainDataset). На відміну від st.cache_data, st.cache_resource
+    не серіалізує результат, тож усі сторінки отримують той самий об'єкт, а з увімкненим
+    сховищем хоста (shared_store) - ще й ті самі сторінки пам'яті в усіх процесах.
+    Версія файлу перевіряється на кожному виклику, тож оновлені дані підхоплюються без перезапуску.
+    """
+    _fetch_main_df(file_path)
+    parquet_path = prepare_main_df(file_path)
+    return _open_main_dataset(file_path, _dataset_version(file_path, parquet_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перетворення main_df.csv у Parquet та звіт про пам'ять.")
+    parser.add_argument("src", nargs="?", default=MAIN_DF_CSV)
+    parser.add_argument("dst", nargs="?", default=MAIN_DF_PARQUET)
+    parser.add_argument("--memory-report", action="store_true",
+                        help="порівняти пам'ять колонок зі схемою та з типами pandas за замовчуванням")
+    args = parser.parse_args()
+
+    if args.memory_report:
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(memory_report(read_main_df(csv_path=args.src, parquet_path=args.dst), pd.read_csv(args.src)))
+    else:
+        print(f"Записано {convert_csv_to_parquet(args.src, args.dst)}")
@@ -0,0 +1,76 @@
+import io
+import threading
+
+import matplotlib.pyplot as plt
+import numpy as np
+from cachetools import LRUCache, cached
+from cachetools.keys import hashkey
+
+from stats_cube import HIST_MIN, histogram_quantile
+from telemetry import cache_miss
+
+# Відрендерені PNG дашборду analiz.py, спільні для всіх сесій процесу.
+# Ключ - (версія даних, вибір фільтрів, предмет/тип графіка), тож повторний перегляд
+# тієї самої комбінації фільтрів не виконує жодної роботи matplotlib.
+FIGURE_CACHE_SIZE = 256
+_figure_cache = LRUCache(maxsize=FIGURE_CACHE_SIZE)
+_figure_cache_lock = threading.Lock()
+
+
+def _to_png(fig):
+    """Растеризує фігуру з тими ж параметрами, що й st.pyplot, і закриває її."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def box_stats(summary, label, whis=1.5):
+    """
+    Статистики бокс-плоту (як у matplotlib.cbook.boxplot_stats) з гістограми куба:
+    квартилі, вуса в межах whis * IQR та викиди (по одному на кожен зайнятий бал).
+    """
+    hist = summary['hist']
+    q1, median, q3 = (histogram_quantile(hist, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    occupied = (np.flatnonzero(hist) + HIST_MIN).astype(float)
+    occupied[0], occupied[-1] = summary['min'], summary['max']
+    inside = occupied[(occupied >= q1 - whis * iqr) & (occupied <= q3 + whis * iqr)]
+    return {
+        'label': label, 'med': median, 'q1': q1, 'q3': q3,
+        'whislo': inside.min() if len(inside) else q1,
+        'whishi': inside.max() if len(inside) else q3,
+        'fliers': occupied[(occupied < q1 - whis * iqr) | (occupied > q3 + whis * iqr)],
+        'mean': summary['sum'] / summary['count'],
+    }
+
+
+@cached(_figure_cache, key=lambda dataset_version, selection, col_name, summary:
+        hashkey(dataset_version, selection, 'hist', col_name), lock=_figure_cache_lock)
+def histogram_png(dataset_version, selection, col_name, summary):
+    """Гістограма балів предмету з попередньо порахованих частот (крок 1 бал)."""
+    cache_miss()
+    hist = summary['hist']
+    occupied = np.flatnonzero(hist)
+    first, last = occupied[0], occupied[-1] + 1
+    edges = np.arange(first, last + 1) + HIST_MIN
+    fig_hist, ax_hist = plt.subplots(figsize=(6, 4))
+    ax_hist.hist(edges[:-1], bins=edges, weights=hist[first:last], edgecolor='black', color='blue')
+    ax_hist.set_xlabel('Бали')
+    ax_hist.set_ylabel('Кількість учнів')
+    ax_hist.grid(axis='y', alpha=0.75)
+    fig_hist.tight_layout()
+    return _to_png(fig_hist)
+
+
+@cached(_figure_cache, key=lambda dataset_version, selection, stats, title:
+        hashkey(dataset_version, selection, 'box'), lock=_figure_cache_lock)
+def boxplot_png(dataset_version, selection, stats, title):
+    """Порівняльний бокс-плот за готовими статистиками (box_stats) кожного предмету."""
+    cache_miss()
+    fig_box, ax_box = plt.subplots(figsize=(10, 6))
+    ax_box.bxp(stats, patch_artist=True)
+    ax_box.set_title(title)
+    ax_box.set_ylabel('Бали')
+    ax_box.grid(axis='y', alpha=0.75)
+    return _to_png(fig_box)
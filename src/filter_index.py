@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# Рівні каскадних фільтрів дашборду analiz.py (у порядку вкладеності)
+FILTER_LEVELS = ['exam_year', 'regname', 'settlement_type', 'settlement_name', 'eoname']
+
+# Значення фільтра "усі" ('Всі роки' / 'Всі') у префіксі
+ALL = None
+
+
+def _level_values(column):
+    """Значення рівня так, як їх показують списки: числа для років, рядки для решти."""
+    if pd.api.types.is_numeric_dtype(column) and not column.isna().any():
+        return column.to_numpy()
+    return column.astype(str).to_numpy()
+
+
+class FilterIndex:
+    """
+    Ієрархічний індекс для каскадних фільтрів analiz.py.
+
+    Рядки групуються в "комірки" - унікальні комбінації значень FILTER_LEVELS,
+    відсортовані лексикографічно. Рядки кожної комірки лежать неперервним відрізком
+    у перестановці `order`, тож вибірка будь-якого префікса - це конкатенація відрізків.
+    Списки дочірніх опцій і набори комірок для префіксів будуються по таблиці комірок
+    (а не по рядках) один раз на шаблон префікса і далі беруться зі словника.
+    """
+
+    def __init__(self, frame, levels=FILTER_LEVELS):
+        self.levels = list(levels)
+        self.n_rows = len(frame)
+        self._uniques = []
+        self._code_of = []
+        codes = []
+        for level in self.levels:
+            level_codes, uniques = pd.factorize(_level_values(frame[level]), sort=True)
+            codes.append(level_codes.astype(np.int64))
+            self._uniques.append(uniques)
+            self._code_of.append({value: code for code, value in enumerate(uniques.tolist())})
+
+        # Змішана система числення: один int64-ключ на рядок зберігає лексикографічний порядок
+        radices = [max(len(uniques), 1) for uniques in self._uniques]
+        if np.prod(radices, dtype=float) < 2 ** 62:
+            row_key = np.zeros(self.n_rows, dtype=np.int64)
+            for level_codes, radix in zip(codes, radices):
+                row_key = row_key * radix + level_codes
+            cell_keys, row_cell = np.unique(row_key, return_inverse=True)
+            cell_codes = {}
+            remainder = cell_keys
+            for level, radix in reversed(list(zip(self.levels, radices))):
+                remainder, cell_codes[level] = np.divmod(remainder, radix)
+            self._cells = pd.DataFrame({level: cell_codes[level] for level in self.levels})
+        else:
+            cell_table, row_cell = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+            self._cells = pd.DataFrame(cell_table, columns=self.levels)
+        row_cell = row_cell.ravel()
+        n_cells = len(self._cells)
+
+        self.order = np.argsort(row_cell, kind='stable')
+        self.offsets = np.zeros(n_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_cell, minlength=n_cells), out=self.offsets[1:])
+
+        self._options_tables = {}
+        self._cells_tables = {}
+
+    @property
+    def n_cells(self):
+        return len(self._cells)
+
+    def _encode(self, prefix):
+        """Префікс значень -> (шаблон конкретних рівнів, кортеж їхніх кодів) або None, якщо значення немає."""
+        pattern, key = [], []
+        for depth, value in enumerate(prefix):
+            if value is ALL:
+                continue
+            code = self._code_of[depth].get(value)
+            if code is None:
+                return None
+            pattern.append(self.levels[depth])
+            key.append(code)
+        return tuple(pattern), tuple(key)
+
+    def _lookup(self, tables, pattern, key, build):
+        table = tables.get(pattern)
+        if table is None:
+            table = tables[pattern] = build(pattern)
+        if not pattern:
+            return table
+        return table.get(key)
+
+    def _groups(self, pattern):
+        """Групи таблиці комірок за рівнями шаблону з ключами-кортежами."""
+        grouped = self._cells.groupby(list(pattern) if len(pattern) > 1 else pattern[0])
+        return grouped, (lambda group: group if isinstance(group, tuple) else (group,))
+
+    def options(self, prefix):
+        """Відсортовані значення рівня len(prefix) для рядків, що відповідають префіксу."""
+        child = self.levels[len(prefix)]
+        encoded = self._encode(prefix)
+        if encoded is None:
+            return []
+        pattern, key = encoded
+
+        def build(pattern):
+            if not pattern:
+                return np.unique(self._cells[child].to_numpy())
+            grouped, as_key = self._groups(pattern)
+            return {as_key(group): np.unique(values) for group, values in grouped[child]}
+
+        child_codes = self._lookup(self._options_tables.setdefault(child, {}), pattern, key, build)
+        if child_codes is None:
+            return []
+        return self._uniques[len(prefix)][child_codes].tolist()
+
+    def cells(self, selection):
+        """Номери комірок, що відповідають вибору (значення або ALL для кожного рівня)."""
+        encoded = self._encode(selection)
+        if encoded is None:
+            return np.empty(0, dtype=np.int64)
+        pattern, key = encoded
+
+        def build(pattern):
+            if not pattern:
+                return np.arange(self.n_cells)
+            grouped, as_key = self._groups(pattern)
+            return {as_key(group): cells for group, cells in grouped.indices.items()}
+
+        found = self._lookup(self._cells_tables, pattern, key, build)
+        return np.empty(0, dtype=np.int64) if found is None else found
+
+    def rows(self, selection):
+        """
+        Позиції рядків (у зростаючому порядку) для вибору, або None, якщо вибрано все
+        і базовий кадр можна використовувати без вибірки.
+        """
+        if all(value is ALL for value in selection):
+            return None
+        cells = self.cells(selection)
+        starts = self.offsets[cells]
+        lengths = self.offsets[cells + 1] - starts
+        total = int(lengths.sum())
+        # Вектором розгортаємо відрізки [start, start + length) без циклу по комірках
+        shifts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = self.order[shifts + np.arange(total)]
+        positions.sort()
+        return positions
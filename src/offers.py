@@ -0,0 +1,182 @@
+"""
+Скомпільована таблиця конкурсних пропозицій для аналізу шансів на вступ.
+
+konkurs_NMT.csv (багаторядкові назви колонок, бали з десятковою комою) один раз
+зводиться до таблиці пропозицій, усереднених за роками, і зберігається у файлі Arrow IPC:
+університет, спеціальність та інші ключі - категорії (словникове кодування), бали - float64,
+рядки відсортовані за середнім балом. Сторінка читає файл через memory map без розбору CSV.
+
+Файл містить штамп джерела (розмір, mtime, SHA-256 CSV); якщо CSV змінився,
+таблиця вважається застарілою і компілюється заново.
+
+    python src/offers.py                      # src/konkurs_NMT.csv -> src/offers.arrow
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+from shared_store import version_key
+
+KONKURS_CSV = "src/konkurs_NMT.csv"
+OFFERS_PATH = "src/offers.arrow"
+STAMP_KEY = b"nmt_offers_source"
+OFFERS_STORE_NAME = "offers"
+
+# Колонки konkurs_NMT.csv -> колонки таблиці пропозицій
+REQUIRED_COLUMNS = {
+    'Назва закладу': 'Університет',
+    'Спеціальність': 'Спеціальність',
+    'шк_Мін. бал\n(на загальних підставах)': 'Мін_Бал',
+    'шк_Сер. бал\n(на загальних підставах)': 'Сер_Бал',
+    'шк_Макс. бал\n(на загальних підставах)': 'Макс_Бал',
+}
+OPTIONAL_COLUMNS = {
+    'Освітній ступінь': 'Освітній_ступінь',
+    'Вступ на основі': 'Вступ_на_основі',
+    'Форма навчання': 'Форма_навчання',
+}
+SCORE_COLS = ['Мін_Бал', 'Сер_Бал', 'Макс_Бал']
+MISSING_LABEL = 'Не вказано'
+
+
+class OffersError(ValueError):
+    """CSV пропозицій не містить потрібних колонок або коректних балів."""
+
+
+def aggregate_offers(df):
+    """
+    Пропозиції, усереднені за роками для однакових (університет, спеціальність, ступінь,
+    основа вступу, форма навчання). Ключі - категорії з відсортованими значеннями,
+    рядки впорядковані за середнім, потім мінімальним балом.
+    """
+    missing_cols = set(REQUIRED_COLUMNS) - set(df.columns)
+    if missing_cols:
+        raise OffersError(f"CSV файл не містить обов'язкових колонок: {', '.join(missing_cols)}")
+
+    rename_map = dict(REQUIRED_COLUMNS)
+    rename_map.update({orig: new for orig, new in OPTIONAL_COLUMNS.items() if orig in df.columns})
+    offers = df[list(rename_map)].rename(columns=rename_map)
+    for col in SCORE_COLS:
+        if offers[col].dtype == 'object':
+            offers[col] = offers[col].str.replace(',', '.', regex=False)
+        offers[col] = pd.to_numeric(offers[col], errors='coerce')
+    offers = offers.dropna(subset=SCORE_COLS)
+    if offers.empty:
+        raise OffersError("Файл порожній після видалення рядків з некоректними балами.")
+
+    grouping_keys = ['Університет', 'Спеціальність']
+    for col in OPTIONAL_COLUMNS.values():
+        if col in offers.columns:
+            grouping_keys.append(col)
+            offers[col] = offers[col].fillna(MISSING_LABEL)
+    offers = offers.groupby(grouping_keys, as_index=False)[SCORE_COLS].mean()
+    offers[SCORE_COLS] = offers[SCORE_COLS].round(2)
+    for col in grouping_keys:
+        offers[col] = offers[col].astype(pd.CategoricalDtype(sorted(offers[col].unique())))
+    return offers.sort_values(['Сер_Бал', 'Мін_Бал'], kind='stable', ignore_index=True)
+
+
+def read_offers_csv(csv_path=KONKURS_CSV):
+    """Резервний шлях: розбирає та агрегує CSV пропозицій."""
+    return aggregate_offers(pd.read_csv(csv_path))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_stamp(csv_path=KONKURS_CSV):
+    """Штамп версії CSV: розмір, mtime та SHA-256 вмісту."""
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _sha256(csv_path)}
+
+
+def _is_current(stamp, csv_path):
+    """Чи скомпільована таблиця з поточного CSV. Хеш рахується лише якщо змінився mtime."""
+    stat = os.stat(csv_path)
+    if stamp.get('size') != stat.st_size:
+        return False
+    return stamp.get('mtime_ns') == stat.st_mtime_ns or stamp.get('sha256') == _sha256(csv_path)
+
+
+def write_offers(offers, stamp, path=OFFERS_PATH):
+    """Записує таблицю пропозицій у файл Arrow IPC (без стиснення, щоб його можна було відобразити в пам'ять)."""
+    table = pa.Table.from_pandas(offers, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, STAMP_KEY: json.dumps(stamp).encode()})
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def compile_offers(csv_path=KONKURS_CSV, path=OFFERS_PATH):
+    """Одноразово компілює CSV пропозицій у таблицю `path`."""
+    stamp = source_stamp(csv_path)
+    return write_offers(read_offers_csv(csv_path), stamp, path)
+
+
+def read_offers(csv_path=KONKURS_CSV, path=OFFERS_PATH):
+    """Таблиця пропозицій через memory map, якщо вона скомпільована з поточного CSV, інакше None."""
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    stamp = json.loads((table.schema.metadata or {}).get(STAMP_KEY, b'{}'))
+    if os.path.exists(csv_path) and not _is_current(stamp, csv_path):
+        return None
+    return table.to_pandas()
+
+
+def load_offers(csv_path=KONKURS_CSV, path=OFFERS_PATH):
+    """
+    Таблиця пропозицій: зі скомпільованого файлу, а якщо він відсутній чи застарів -
+    з CSV (з компіляцією файлу для наступних завантажень, якщо каталог доступний для запису).
+    """
+    offers = read_offers(csv_path, path)
+    if offers is not None:
+        return offers
+    stamp = source_stamp(csv_path)
+    offers = read_offers_csv(csv_path)
+    try:
+        write_offers(offers, stamp, path)
+    except OSError:
+        pass
+    return offers
+
+
+def source_version(csv_path=KONKURS_CSV):
+    """Дешева версія CSV (розмір, mtime) для ключів кешу; None, якщо файлу ще немає."""
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def shared_offers(store, csv_path=KONKURS_CSV, path=OFFERS_PATH):
+    """
+    Таблиця пропозицій зі сховища хоста (shared_store), відображена в пам'ять без копіювання;
+    нова версія CSV публікується один раз на хост через load_offers.
+    """
+    version = version_key(source_version(csv_path), sorted(REQUIRED_COLUMNS.values()))
+    return store.load(OFFERS_STORE_NAME, version, lambda: load_offers(csv_path, path))
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else KONKURS_CSV
+    dst = sys.argv[2] if len(sys.argv) > 2 else OFFERS_PATH
+    print(f"Записано {compile_offers(src, dst)}")
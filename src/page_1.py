@@ -1,187 +1,101 @@
 import streamlit as st
 import pandas as pd
-import joblib
 import numpy as np
 import os
+import time
+import plotly.express as px
+
+from scoring import (SUBJECTS_CONFIG, FEATURE_COLS, S_MIN, S_MAX, get_model, get_predictor, model_status,
+                     MODEL_LOADED, MODEL_FAILED, calculate_score_balanced,
+                     calculate_score_individual_adjusted, calculate_score_cautious_stress,
+                     sweep_scores, SWEEP_W_GRID, SWEEP_K_STRESS_GRID, SWEEP_O12_GRID,
+                     settlement_types_options, school_types_options, oblast_options, sextypename_options,
+                     EXAM_YEAR_MIN, EXAM_YEAR_MAX, BIRTH_MIN, BIRTH_MAX)
+from prediction_table import PredictionTable, PREDICTION_TABLE_PATH
+from artifacts import fetch_artifact
+from offers import OFFERS_PATH, OffersError, load_offers, shared_offers, source_version as offers_source_version
+from shared_store import default_store
+from admission import (CHANCE_LABELS, CHANCE_ORDER_MAP, OfferIndex, classify_admission_chances,
+                       chance_matrix, cohort_band_counts)
+from batch_scoring import required_columns, score_frame
+from telemetry import span, cache_miss
 
 
 st.set_page_config(page_title="Калькулятор НМТ та Шанси на Вступ", layout="wide")
 
-# --- КОНФІГУРАЦІЯ ПРЕДМЕТІВ ТА ШЛЯХІВ ДО МОДЕЛЕЙ ---
-SUBJECTS_CONFIG = {
-    "Українська мова": {
-        "key": "new",
-        "model_path": "src/lgbm_model_new.pkl"
-    },
-    "Математика": {
-        "key": "math",
-        "model_path": "src/lgbm_model_math.pkl"
-    },
-    "Історія України": {
-        "key": "hist",
-        "model_path": "src/lgbm_model_hist.pkl"
-    }
-}
-
-# --- ОПЦІЇ ДЛЯ ВИПАДАЮЧИХ СПИСКІВ ---
-settlement_types_options = ['обласний центр', 'місто', 'село', 'смт', 'інше']
-school_types_options = [
-    'середня загальноосвітня школа', 'навчально-виховний комплекс', 'ліцей',
-    'спеціалізована школа', 'науковий ліцей', 'гімназія', 'заклад фахової передвищої освіти',
-    'заклад вищої освіти', 'колегіум', 'заклад професійної (професійно-технічної) освіти',
-    'загальноосвітня санаторна школа', "навчально-виховне об'єднання", 'ліцей із посиленою військово-фізичною підготовкою',
-    'спортивний ліцей', 'середня загальноосвітня школа-інтернат', 'спеціалізована школа-інтернат',
-    'спеціальна загальноосвітня школа', 'колегіум/колеж', 'військовий (військово-морський, військово-спортивний) ліцей',
-    'колеж', 'вечірня (змінна) школа', 'спеціальна загальноосвітня школа-інтернат',
-    'професійний ліцей відповідного профілю', 'початкова школа', 'Пенітенціарна установа',
-    'мистецький ліцей', 'спеціальна школа', 'вищий навчальний заклад III-IV рівнів акредитації',
-    'навчально-реабілітаційний центр', 'школа соціальної реабілітації', 'професійний коледж (коледж) спортивного профілю'
-]
-oblast_options = [
-    'Миколаївська область', 'Черкаська область', 'Чернігівська область', 'Запорізька область', 'Луганська область',
-    'Рівненська область', 'Одеська область', 'Київська область', 'Вінницька область', 'Тернопільська область',
-    'Дніпропетровська область', 'м.Київ', 'Львівська область', 'Хмельницька область', 'Харківська область',
-    'Кіровоградська область', 'Чернівецька область', 'Волинська область', 'Івано-Франківська область',
-    'Донецька область', 'Полтавська область', 'Херсонська область', 'Закарпатська область', 'Сумська область',
-    'Житомирська область'
-]
-
-# --- КОНСТАНТИ ДЛЯ РОЗРАХУНКІВ ---
-NMT_MIN = 100.0
-NMT_MAX = 200.0
-S_MIN = 1.0
-S_MAX = 12.0
-DELTA_NMT = NMT_MAX - NMT_MIN
-DELTA_S = S_MAX - S_MIN
-O_AVG = 7.5
-K_SCALE = DELTA_NMT / DELTA_S
-
 # --- ЗАВАНТАЖЕННЯ МОДЕЛЕЙ НМТ---
+# Моделі завантажуються ліниво: кожна - при першому розрахунку свого предмету,
+# тож перший рендер сторінки не чекає на завантаження та десеріалізацію всіх моделей.
+page_render_started = time.perf_counter()
+
 @st.cache_resource
-def load_all_nmt_models(subject_config):
-
-    if 'dev' in os.environ['ENVIROMENT_MODE']:
-        st.warning("Завантаження моделей НМТ вимкнено в режимі розробки. "
-                   "Перевірте, чи встановлено змінну оточення ENVIROMENT_MODE у 'prod' для завантаження моделей.")
-    elif 'prod' in os.environ['ENVIROMENT_MODE']:
-        st.info("Завантаження моделей НМТ увімкнено 'prod'.")
-        import boto3
-        s3 = boto3.client('s3')
-        s3.download_file('nmt', 'lgbm_model_hist.pkl', 'src/lgbm_model_hist.pkl')
-        s3.download_file('nmt', 'lgbm_model_math.pkl', 'src/lgbm_model_math.pkl')
-        s3.download_file('nmt', 'lgbm_model_new.pkl', 'src/lgbm_model_new.pkl')
-        s3.download_file('nmt', 'konkurs_NMT.csv', 'src/konkurs_NMT.csv')
-
-
-
-    loaded_models = {}
-    all_loaded_successfully = True
-    for subject_display_name, config in subject_config.items():
-        subject_key = config["key"]
-        model_path = config["model_path"]
-        try:
-            loaded_models[subject_key] = joblib.load(model_path)
-        except FileNotFoundError:
-            st.error(f"ПОМИЛКА: Файл моделі {model_path} для '{subject_display_name}' НЕ ЗНАЙДЕНО.")
-            loaded_models[subject_key] = None
-            all_loaded_successfully = False
-        except Exception as e:
-            st.error(f"ПОМИЛКА завантаження моделі {model_path} для '{subject_display_name}': {e}")
-            loaded_models[subject_key] = None
-            all_loaded_successfully = False
-    return loaded_models, all_loaded_successfully
-
-nmt_models, all_nmt_models_loaded = load_all_nmt_models(SUBJECTS_CONFIG)
-if all_nmt_models_loaded and nmt_models:
-    st.sidebar.success("Моделі НМТ завантажено!")
-else:
-    st.sidebar.error("Помилка завантаження моделей НМТ!")
-
-
-# --- ФУНКЦІЇ РОЗРАХУНКУ БАЛІВ НМТ ---
-def calculate_score_balanced(b_model: float, o_12: float, w: float = 0.5) -> float:
-    if not (S_MIN <= o_12 <= S_MAX): return max(NMT_MIN, min(NMT_MAX, b_model))
-    b_o12_norm = NMT_MIN + (o_12 - S_MIN) * (DELTA_NMT / DELTA_S)
-    final_score = w * b_model + (1 - w) * b_o12_norm
-    return max(NMT_MIN, min(NMT_MAX, final_score))
-
-def calculate_score_individual_adjusted(b_model: float, o_12: float) -> float:
-    if not (S_MIN <= o_12 <= S_MAX): return max(NMT_MIN, min(NMT_MAX, b_model))
-    b_adjusted = b_model + (o_12 - O_AVG) * K_SCALE
-    final_score = max(NMT_MIN, min(NMT_MAX, b_adjusted))
-    return final_score
-
-def calculate_score_cautious_stress(b_model: float, o_12: float, k_stress: float = 1.0) -> float:
-    if not (S_MIN <= o_12 <= S_MAX): return max(NMT_MIN, min(NMT_MAX, b_model))
-    o_12_stressed = max(S_MIN, o_12 - k_stress)
-    b_o12_stressed_norm = NMT_MIN + (o_12_stressed - S_MIN) * (DELTA_NMT / DELTA_S)
-    final_score = (b_model + b_o12_stressed_norm) / 2
-    return max(NMT_MIN, min(NMT_MAX, final_score))
+def render_timings():
+    """Час першого (холодного) рендеру сторінки в цьому процесі."""
+    return {}
 
-# --- ФУНКЦІЇ ДЛЯ АНАЛІЗУ ШАНСІВ НА ВСТУП ---
-@st.cache_data
-def load_university_data(data_path):
+def load_subject_model(subject_display_name):
+    """Модель предмету (завантажується з S3 у 'prod' і з диска лише при першому використанні)."""
+    config = SUBJECTS_CONFIG[subject_display_name]
     try:
-        df = pd.read_csv(data_path)
-        
-        col_university_orig = 'Назва закладу'
-        col_specialty_orig = 'Спеціальність'
-        col_min_score_orig = 'шк_Мін. бал\n(на загальних підставах)'
-        col_avg_score_orig = 'шк_Сер. бал\n(на загальних підставах)'
-        col_max_score_orig = 'шк_Макс. бал\n(на загальних підставах)'
-        col_degree_level_orig = 'Освітній ступінь'
-        col_basis_of_entry_orig = 'Вступ на основі'
-        col_form_of_study_orig = 'Форма навчання'
-
-        required_columns_for_chances = {
-            col_university_orig, col_specialty_orig, 
-            col_min_score_orig, col_avg_score_orig, col_max_score_orig
-        }
-        
-        missing_cols = required_columns_for_chances - set(df.columns)
-        if missing_cols:
-            st.error(f"CSV файл '{data_path}' не містить обов'язкових колонок: {', '.join(missing_cols)}")
-            return None
-
-        df_processed = df.copy()
-        score_cols_to_convert = [col_min_score_orig, col_avg_score_orig, col_max_score_orig]
-        for col in score_cols_to_convert:
-            if df_processed[col].dtype == 'object':
-                df_processed[col] = df_processed[col].str.replace(',', '.', regex=False)
-            df_processed[col] = pd.to_numeric(df_processed[col], errors='coerce')
-
-        df_processed.dropna(subset=score_cols_to_convert, inplace=True)
-        if df_processed.empty:
-            st.warning(f"Файл '{data_path}' порожній після видалення рядків з некоректними балами.")
-            return None
-        
-        rename_map = {
-            col_university_orig: 'Університет', col_specialty_orig: 'Спеціальність',
-            col_min_score_orig: 'Мін_Бал', col_avg_score_orig: 'Сер_Бал', col_max_score_orig: 'Макс_Бал'
-        }
-        optional_cols_map = {
-            col_degree_level_orig: 'Освітній_ступінь', col_basis_of_entry_orig: 'Вступ_на_основі',
-            col_form_of_study_orig: 'Форма_навчання'
-        }
-        for orig_col, new_col in optional_cols_map.items():
-            if orig_col in df_processed.columns: rename_map[orig_col] = new_col
-        
-        df_processed.rename(columns=rename_map, inplace=True)
+        if model_status(config["key"])[0] != MODEL_LOADED and 'prod' in os.environ['ENVIROMENT_MODE']:
+            fetch_artifact(config["model_path"])
+        return get_model(config["key"])
+    except FileNotFoundError:
+        st.error(f"ПОМИЛКА: Файл моделі {config['model_path']} для '{subject_display_name}' НЕ ЗНАЙДЕНО.")
+    except Exception as e:
+        st.error(f"ПОМИЛКА завантаження моделі {config['model_path']} для '{subject_display_name}': {e}")
+    return None
 
-        grouping_keys = ['Університет', 'Спеціальність']
-        for col_name in ['Освітній_ступінь', 'Вступ_на_основі', 'Форма_навчання']:
-            if col_name in df_processed.columns:
-                grouping_keys.append(col_name)
-                df_processed[col_name].fillna('Не вказано', inplace=True) 
+if 'dev' in os.environ['ENVIROMENT_MODE']:
+    st.warning("Завантаження моделей НМТ вимкнено в режимі розробки. "
+               "Перевірте, чи встановлено змінну оточення ENVIROMENT_MODE у 'prod' для завантаження моделей.")
 
-        agg_funcs = {'Мін_Бал': 'mean', 'Сер_Бал': 'mean', 'Макс_Бал': 'mean'}
-        df_aggregated = df_processed.groupby(grouping_keys, as_index=False).agg(agg_funcs)
-        
-        for col in ['Мін_Бал', 'Сер_Бал', 'Макс_Бал']:
-            df_aggregated[col] = df_aggregated[col].round(2)
+# --- ТАБЛИЦЯ ПОПЕРЕДНЬО РОЗРАХОВАНИХ ПРОГНОЗІВ ---
+@st.cache_resource(max_entries=1)
+def load_prediction_table(table_path, source_version=None):
+    """
+    Таблиця прогнозів (prediction_table.py), якщо вона побудована з поточних файлів моделей.
+    `source_version` - версії таблиці та файлів моделей: після перебудови таблиці або оновлення
+    моделей (зокрема, коли вони з'явилися вже після першого запуску) вона перечитується.
+    """
+    cache_miss()
+    if not os.path.exists(table_path):
+        return None
+    try:
+        table = PredictionTable(table_path)
+    except Exception:
+        return None
+    return table if table.is_valid_for(SUBJECTS_CONFIG) else None
 
-        final_columns_to_keep = [col for col in grouping_keys + ['Мін_Бал', 'Сер_Бал', 'Макс_Бал'] if col in df_aggregated.columns]
-        return df_aggregated[final_columns_to_keep]
+with span('load_prediction_table', cached=True):
+    # Розмір і mtime таблиці та моделей (source_version з offers.py рахує їх для будь-якого файлу)
+    prediction_table_files = [PREDICTION_TABLE_PATH] + [config_item["model_path"] for config_item in SUBJECTS_CONFIG.values()]
+    prediction_table = load_prediction_table(
+        PREDICTION_TABLE_PATH, tuple(offers_source_version(path) for path in prediction_table_files))
+if prediction_table is not None:
+    st.sidebar.caption("⚡ Прогнози беруться з попередньо розрахованої таблиці.")
+
+
+# --- ФУНКЦІЇ ДЛЯ АНАЛІЗУ ШАНСІВ НА ВСТУП ---
+@st.cache_resource(show_spinner="Завантаження конкурсних пропозицій...", max_entries=1)
+def load_university_data(data_path, source_version=None):
+    """
+    Пропозиції, усереднені за роками (offers.py), для версії CSV `source_version`.
+    Відображаються в пам'ять зі сховища хоста (shared_store), спільного для всіх процесів,
+    або читаються зі скомпільованого файлу; CSV розбирається лише якщо файл відсутній
+    або застарів. Кадр спільний для всіх сесій - сторінка фільтрує його копії.
+    """
+    cache_miss()
+    try:
+        if 'prod' in os.environ['ENVIROMENT_MODE']:
+            fetch_artifact(data_path)
+        store = default_store()
+        if store is not None:
+            try:
+                return shared_offers(store, data_path, OFFERS_PATH)
+            except OSError:
+                pass
+        return load_offers(data_path, OFFERS_PATH)
 
     except FileNotFoundError:
         st.error(f"Файл '{data_path}' не знайдено. Перевірте шлях та наявність файлу.")
@@ -189,42 +103,32 @@ def load_university_data(data_path):
     except pd.errors.EmptyDataError:
         st.error(f"Файл '{data_path}' порожній.")
         return None
-    except KeyError as e:
-        st.error(f"Помилка ключа при обробці даних: колонка {e} не знайдена. Перевірте відповідність назв колонок у файлі та в коді.")
+    except OffersError as e:
+        st.error(f"Помилка у файлі '{data_path}': {e}")
         return None
     except Exception as e:
         st.error(f"Помилка при завантаженні або обробці файлу '{data_path}': {e}")
         return None
 
-def get_admission_chances(applicant_score, min_score, avg_score, max_score):
-    if applicant_score is None: return "Н/Д (немає балу абітурієнта)"
-    if pd.isna(min_score) or pd.isna(avg_score) or pd.isna(max_score): return "Н/Д (немає даних по спеціальності)"
-    if applicant_score >= max_score: return "🏆 Дуже високий шанс (вище макс.)"
-    elif applicant_score >= avg_score + (max_score - avg_score) * 0.75 : return "🥇 Дуже високий шанс"
-    elif applicant_score >= avg_score + (max_score - avg_score) * 0.25: return "🥈 Високий шанс"
-    elif applicant_score >= avg_score: return "🥉 Хороший шанс"
-    elif applicant_score >= min_score + (avg_score - min_score) * 0.75: return "👍 Задовільний шанс"
-    elif applicant_score >= min_score: return "😐 Середній шанс (конкурсна)"
-    elif applicant_score >= min_score * 0.95 : return "⚠️ Низький шанс (на межі)"
-    elif applicant_score >= min_score * 0.9: return "📉 Дуже низький шанс"
-    else: return "📉📉 Вкрай низький шанс"
-
-# Порядок шансів для сортування та фільтрації
-CHANCE_ORDER_MAP = {
-    "🏆 Дуже високий шанс (вище макс.)": 0, "🥇 Дуже високий шанс": 1, "🥈 Високий шанс": 2,
-    "🥉 Хороший шанс": 3, "👍 Задовільний шанс": 4, "😐 Середній шанс (конкурсна)": 5,
-    "⚠️ Низький шанс (на межі)": 6, "📉 Дуже низький шанс": 7, "📉📉 Вкрай низький шанс": 8,
-    "Н/Д (немає даних по спеціальності)": 9, "Н/Д (немає балу абітурієнта)": 10
-}
+# Кількість найближчих за середнім балом пропозицій у вкладці шансів
+CLOSEST_OFFERS_K = 10
+# Повна матриця "абітурієнт x пропозиція" показується лише для невеликого вибору пропозицій
+COHORT_MATRIX_MAX_OFFERS = 50
 
+@st.cache_resource(max_entries=1)
+def load_offer_index(_university_df, data_path, source_version=None):
+    """Індекс меж рівнів шансів за рядками university_df (admission.OfferIndex), один на версію даних."""
+    cache_miss()
+    return OfferIndex(_university_df['Мін_Бал'], _university_df['Сер_Бал'], _university_df['Макс_Бал'])
 
 # --- ОСНОВНИЙ ІНТЕРФЕЙС З ВКЛАДКАМИ ---
 st.title("🧮 Калькулятор НМТ та Аналіз Шансів на Вступ 🎓")
 
 if 'applicant_total_score' not in st.session_state: st.session_state.applicant_total_score = None
 if 'calculated_subject_scores_display' not in st.session_state: st.session_state.calculated_subject_scores_display = {}
+if 'model_predictions' not in st.session_state: st.session_state.model_predictions = {}
 
-tab1, tab2 = st.tabs(["📊 Розрахунок балу НМТ", "🎓 Аналіз шансів на вступ"])
+tab1, tab2, tab3 = st.tabs(["📊 Розрахунок балу НМТ", "🎓 Аналіз шансів на вступ", "👥 Режим когорти"])
 
 with tab1:
     st.markdown("""
@@ -239,21 +143,16 @@ with tab1:
     """)
     st.markdown("---")
 
-    if not all_nmt_models_loaded:
-        st.error("Не вдалося завантажити одну або більше моделей для розрахунку НМТ. Розрахунок балів НМТ не доступний.")
-        st.stop()
-
     st.header("🙋 Загальна інформація про абітурієнта")
     col1, col2 = st.columns(2)
     with col1:
-        exam_year = st.number_input("Рік складання НМТ", min_value=2022, max_value=2070, value=st.session_state.get('exam_year_val', 2025), step=1, help="Рік, у якому планується або відбулося складання НМТ.")
-        sextypename_options = ['чоловіча', 'жіноча']
+        exam_year = st.number_input("Рік складання НМТ", min_value=EXAM_YEAR_MIN, max_value=EXAM_YEAR_MAX, value=st.session_state.get('exam_year_val', 2025), step=1, help="Рік, у якому планується або відбулося складання НМТ.")
         current_sextypename = st.session_state.get('sextypename_val', sextypename_options[0])
         sextypename = st.radio("Стать", options=sextypename_options, horizontal=True, index=sextypename_options.index(current_sextypename), help="Ваша стать.")
         current_regname = st.session_state.get('regname_val', oblast_options[0])
         regname = st.selectbox('Область реєстрації', options=oblast_options, index=oblast_options.index(current_regname) if current_regname in oblast_options else 0, help="Область, де ви зареєстровані або де знаходиться ваш навчальний заклад.")
     with col2:
-        birth = st.number_input("Рік народження", min_value=1950, max_value=2020, value=st.session_state.get('birth_val', 2008), step=1, help="Ваш повний рік народження.")
+        birth = st.number_input("Рік народження", min_value=BIRTH_MIN, max_value=BIRTH_MAX, value=st.session_state.get('birth_val', 2008), step=1, help="Ваш повний рік народження.")
         current_settlement_type = st.session_state.get('settlement_type_val', settlement_types_options[0])
         settlement_type = st.selectbox('Тип населеного пункту', options=settlement_types_options, index=settlement_types_options.index(current_settlement_type) if current_settlement_type in settlement_types_options else 0, help="Тип населеного пункту вашого навчального закладу.")
         current_eotypename = st.session_state.get('eotypename_val', school_types_options[0])
@@ -313,29 +212,46 @@ with tab1:
             st.stop()
 
         try:
-            feature_cols = ['exam_year', 'birth', 'sextypename', 'regname', 'settlement_type', 'eotypename']
             input_values = [exam_year, birth, sextypename, regname, settlement_type, eotypename]
-            common_input_data = pd.DataFrame([input_values], columns=feature_cols)
+            common_input_data = pd.DataFrame([input_values], columns=FEATURE_COLS)
+            # Якщо комбінація ознак є в таблиці, моделі не викликаються
+            with span('predict', source='table'):
+                table_predictions = prediction_table.predict(*input_values) if prediction_table is not None else None
+            # Інакше моделі всіх предметів рахуються на одному кодуванні ознак (scoring.MultiSubjectPredictor)
+            model_predictions = {}
+            if table_predictions is None:
+                loaded_subject_keys = []
+                for subject_display_name, config_item in SUBJECTS_CONFIG.items():
+                    with span('load_model', cached=True, subject=config_item["key"]):
+                        if load_subject_model(subject_display_name) is not None:
+                            loaded_subject_keys.append(config_item["key"])
+                if loaded_subject_keys:
+                    with span('predict', source='model', subjects=len(loaded_subject_keys)):
+                        model_predictions = get_predictor(loaded_subject_keys).predict(common_input_data)
 
             st.header("📊 Результати розрахунку по предметах:")
             average_subject_scores_for_total = []
             st.session_state.calculated_subject_scores_display = {}
+            st.session_state.model_predictions = {}
             subject_cols = st.columns(len(SUBJECTS_CONFIG))
 
             calculation_successful_for_at_least_one = False
             for idx, (subject_display_name, config_item) in enumerate(SUBJECTS_CONFIG.items()):
                 with subject_cols[idx]:
                     subject_key = config_item["key"]
-                    model_subject = nmt_models.get(subject_key)
                     o_12_subject = o12_scores_input[subject_key]
 
-                    if model_subject is None:
+                    if table_predictions is None and subject_key not in model_predictions:
                         st.warning(f"Модель для '{subject_display_name}' не завантажена.")
                         st.session_state.calculated_subject_scores_display[subject_display_name] = "Модель не завантажена"
                         continue
 
                     st.subheader(f"{subject_display_name}")
-                    predicted_score_subject = model_subject.predict(common_input_data)[0]
+                    if table_predictions is not None:
+                        predicted_score_subject = table_predictions[subject_key]
+                    else:
+                        predicted_score_subject = model_predictions[subject_key][0]
+                    st.session_state.model_predictions[subject_display_name] = float(predicted_score_subject)
                     score_1 = calculate_score_balanced(predicted_score_subject, o_12_subject, w_formula1)
                     score_2 = calculate_score_individual_adjusted(predicted_score_subject, o_12_subject)
                     score_3 = calculate_score_cautious_stress(predicted_score_subject, o_12_subject, k_stress_formula3)
@@ -393,6 +309,34 @@ with tab1:
         st.subheader("🏆 Ваш УЗАГАЛЬНЕНИЙ СЕРЕДНІЙ бал НМТ:")
         st.metric(label="Середній бал НМТ (100-200)", value=f"{st.session_state.applicant_total_score:.2f}")
 
+    # --- РЕЖИМ СЦЕНАРІЇВ ---
+    # Поверхні будуються з уже збережених прогнозів моделей, тож зміна повзунків не викликає моделі.
+    if st.session_state.applicant_total_score is not None and st.session_state.model_predictions:
+        with st.expander("🔬 Режим сценаріїв: чутливість балу до параметрів", expanded=False):
+            st.caption("Усі формули розраховуються одразу на повній сітці: вага прогнозу x фактор стресу x шкільна оцінка.")
+            sweep_subject = st.selectbox("Предмет:", list(st.session_state.model_predictions), key="sweep_subject")
+            sweep_formula = st.radio("Показник:", ["Середній з предмету", "Баланс", "Обережний"], horizontal=True, key="sweep_formula")
+
+            with span('sweep_scores') as sweep_span:
+                sweep = sweep_scores(st.session_state.model_predictions[sweep_subject])[sweep_formula]
+            sweep_ms = sweep_span.seconds * 1000
+
+            k_index = int(np.abs(SWEEP_K_STRESS_GRID - k_stress_formula3).argmin())
+            w_index = int(np.abs(SWEEP_W_GRID - w_formula1).argmin())
+            sweep_cols = st.columns(2)
+            with sweep_cols[0], span('figure_sweep', axes='w'):
+                fig_w = px.imshow(sweep[:, k_index, :], x=SWEEP_O12_GRID, y=SWEEP_W_GRID, origin='lower', aspect='auto',
+                                  labels={'x': 'Шкільна оцінка (1-12)', 'y': 'Вага прогнозу моделі', 'color': 'Бал НМТ'},
+                                  title=f"Вага x оцінка (фактор стресу {SWEEP_K_STRESS_GRID[k_index]:.1f})")
+                st.plotly_chart(fig_w, use_container_width=True)
+            with sweep_cols[1], span('figure_sweep', axes='k'):
+                fig_k = px.imshow(sweep[w_index, :, :], x=SWEEP_O12_GRID, y=SWEEP_K_STRESS_GRID, origin='lower', aspect='auto',
+                                  labels={'x': 'Шкільна оцінка (1-12)', 'y': 'Фактор стресу', 'color': 'Бал НМТ'},
+                                  title=f"Стрес x оцінка (вага прогнозу {SWEEP_W_GRID[w_index]:.2f})")
+                st.plotly_chart(fig_k, use_container_width=True)
+            st.caption(f"Прогноз моделі: {st.session_state.model_predictions[sweep_subject]:.2f}. "
+                       f"Розраховано {sweep.size:,} точок за {sweep_ms:.1f} мс.")
+
 with tab2:
     st.header("Аналіз шансів на вступ до університетів")
     default_file_name = "src/konkurs_NMT.csv"
@@ -407,7 +351,9 @@ with tab2:
         st.caption("Використовуйте фільтри для вибору університетів, спеціальностей та інших параметрів.")
         st.markdown("---")
 
-        university_df = load_university_data(default_file_name)
+        with span('load_university_data', cached=True):
+            offers_version = offers_source_version(default_file_name)
+            university_df = load_university_data(default_file_name, offers_version)
 
         if university_df is not None and not university_df.empty:
             st.subheader("Фільтри та результати аналізу:")
@@ -448,36 +394,61 @@ with tab2:
                 if selected_specialties: active_filters_df = active_filters_df[active_filters_df['Спеціальність'].isin(selected_specialties)]
 
             # Розрахунок шансів для попередньо відфільтрованих даних
-            results_df_for_chances = active_filters_df.copy()
-            if not results_df_for_chances.empty:
-                results_df_for_chances['Шанс Вступу'] = results_df_for_chances.apply(
-                    lambda row: get_admission_chances(st.session_state.applicant_total_score, row['Мін_Бал'], row['Сер_Бал'], row['Макс_Бал']),
-                    axis=1
-                )
+            applicant_score = st.session_state.applicant_total_score
+            if not active_filters_df.empty:
+                offer_index = load_offer_index(university_df, default_file_name, offers_version)
+                # Маска за номерами рядків university_df, що пройшли первинні фільтри (None - пройшли всі);
+                # мітки індексу переводяться в позиції, тож маска не залежить від виду індексу
+                filtered_mask = None
+                if len(active_filters_df) < len(university_df):
+                    filtered_mask = np.zeros(len(university_df), dtype=bool)
+                    filtered_mask[university_df.index.get_indexer(active_filters_df.index)] = True
+
+                # Без первинних фільтрів кількості за рівнями - бінарні пошуки в індексі пропозицій
+                with span('classify_chances', offers=len(active_filters_df)):
+                    if filtered_mask is None:
+                        band_counts = offer_index.band_counts(applicant_score)
+                    else:
+                        band_counts = np.bincount(classify_admission_chances(
+                            applicant_score, active_filters_df['Мін_Бал'], active_filters_df['Сер_Бал'],
+                            active_filters_df['Макс_Бал']), minlength=len(CHANCE_LABELS))
+
+                st.markdown("---")
+                st.subheader("🎯 Пропозиції з середнім балом, найближчим до вашого")
+                closest_positions = offer_index.closest(applicant_score, CLOSEST_OFFERS_K, filtered_mask)
+                closest_df = university_df.take(closest_positions)
+                st.dataframe(closest_df.assign(**{'Шанс Вступу': CHANCE_LABELS[classify_admission_chances(
+                    applicant_score, closest_df['Мін_Бал'], closest_df['Сер_Бал'], closest_df['Макс_Бал'])]}),
+                    use_container_width=False, hide_index=True)
 
                 # Фільтр за розрахованим шансом вступу
                 # Цей фільтр має бути після розрахунку 'Шанс Вступу'
                 st.markdown("---") # Розділювач перед фільтром шансів
                 
-                # Сортуємо рівні шансів для коректного відображення у фільтрі
-                # Використовуємо CHANCE_ORDER_MAP для отримання правильного порядку
-                unique_chance_levels_calculated = sorted(
-                    results_df_for_chances['Шанс Вступу'].dropna().unique(),
-                    key=lambda x: CHANCE_ORDER_MAP.get(x, 99) # 99 для невідомих значень, щоб вони були в кінці
-                )
+                # Рівні шансів у фільтрі впорядковані за їхніми кодами
+                unique_chance_levels_calculated = CHANCE_LABELS[np.flatnonzero(band_counts)].tolist()
                 selected_chance_levels = st.multiselect(
                     "Фільтр за рівнем шансів:", 
                     options=unique_chance_levels_calculated, 
+                    format_func=lambda label: f"{label} ({band_counts[CHANCE_ORDER_MAP[label]]})",
                     placeholder="Показати всі рівні шансів",
                     key="chance_level_filter"
                 )
 
-                final_results_df = results_df_for_chances
+                # Вибрані рівні беруться з індексу; класифікуються лише пропозиції, що показуються
+                final_results_df = active_filters_df
                 if selected_chance_levels:
-                    final_results_df = final_results_df[final_results_df['Шанс Вступу'].isin(selected_chance_levels)]
+                    band_positions = np.sort(np.concatenate([
+                        offer_index.band(applicant_score, CHANCE_ORDER_MAP[label]) for label in selected_chance_levels]))
+                    if filtered_mask is not None:
+                        band_positions = band_positions[filtered_mask[band_positions]]
+                    final_results_df = university_df.take(band_positions)
+                chance_codes = classify_admission_chances(
+                    applicant_score, final_results_df['Мін_Бал'], final_results_df['Сер_Бал'], final_results_df['Макс_Бал'])
+                final_results_df = final_results_df.assign(**{'Шанс Вступу': CHANCE_LABELS[chance_codes],
+                                                              'Сортування_Шансів': chance_codes})
                 
                 if not final_results_df.empty:
-                    final_results_df['Сортування_Шансів'] = final_results_df['Шанс Вступу'].map(CHANCE_ORDER_MAP)
                     results_df_sorted = final_results_df.sort_values(by=['Сортування_Шансів', 'Університет', 'Спеціальність']).drop(columns=['Сортування_Шансів'])
                     
                     display_columns = ['Університет', 'Спеціальність', 'Мін_Бал', 'Сер_Бал', 'Макс_Бал', 'Шанс Вступу']
@@ -506,6 +477,124 @@ with tab2:
         elif university_df is None :
              st.error(f"Не вдалося завантажити або обробити файл даних університетів: '{default_file_name}'. Перевірте шлях, наявність та коректність файлу.")
 
+with tab3:
+    st.header("👥 Режим когорти: шанси класу на вступ")
+    required_roster_columns = required_columns([config_item['key'] for config_item in SUBJECTS_CONFIG.values()])
+    cohort_grade_columns = [col for col in required_roster_columns if col not in FEATURE_COLS]
+    st.caption("Завантажте список абітурієнтів у форматі batch_scoring.py: колонки "
+               f"{', '.join(FEATURE_COLS)} та шкільні оцінки {', '.join(cohort_grade_columns)}. "
+               "Інші колонки (напр., ім'я) показуються без змін. Бали рахуються з вагою прогнозу та фактором стресу з першої вкладки.")
+    roster_file = st.file_uploader("Список абітурієнтів (CSV):", type="csv", key="cohort_roster")
+
+    if roster_file is None:
+        st.info("Завантажте CSV зі списком абітурієнтів, щоб побачити їхні бали та шанси за пропозиціями.")
+    else:
+        roster = None
+        try:
+            roster = pd.read_csv(roster_file)
+        except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            st.error(f"Не вдалося прочитати файл '{roster_file.name}' (очікується CSV у кодуванні UTF-8): {e}")
+        cohort_models = {}
+        if roster is not None:
+            missing_roster_columns = [col for col in required_roster_columns if col not in roster.columns]
+            bad_year_rows = np.array([], dtype=int)
+            if not missing_roster_columns:
+                roster_years = roster[['exam_year', 'birth']].apply(pd.to_numeric, errors='coerce')
+                bad_year_rows = np.flatnonzero(roster_years.isna().any(axis=1).to_numpy())
+            if missing_roster_columns:
+                st.error(f"У файлі бракує колонок: {', '.join(missing_roster_columns)}")
+            elif roster.empty:
+                st.error("У файлі немає жодного абітурієнта.")
+            elif bad_year_rows.size:
+                # +2: рядок заголовка та нумерація з одиниці, як у редакторі таблиць
+                st.error(f"Некоректні роки (exam_year, birth) у рядках файлу: "
+                         f"{', '.join(str(row + 2) for row in bad_year_rows[:10])}{' ...' if bad_year_rows.size > 10 else ''}")
+            else:
+                for subject_display_name, config_item in SUBJECTS_CONFIG.items():
+                    with span('load_model', cached=True, subject=config_item["key"]):
+                        cohort_models[config_item["key"]] = load_subject_model(subject_display_name)
+
+        cohort_scores = None
+        if cohort_models and all(model is not None for model in cohort_models.values()):
+            # Прогнози та формули для всіх абітурієнтів - один виклик кожної моделі (batch_scoring.py)
+            try:
+                with span('cohort_score', applicants=len(roster)):
+                    cohort_scores = score_frame(roster, get_predictor(list(cohort_models)), w=w_formula1, k_stress=k_stress_formula3)
+            except (ValueError, KeyError, TypeError) as e:
+                st.error(f"Не вдалося розрахувати бали абітурієнтів. Перевірте значення колонок "
+                         f"{', '.join(FEATURE_COLS)} (роки - цілі числа): {e}")
+
+        if cohort_scores is not None:
+            identity_columns = [col for col in roster.columns if col not in required_roster_columns]
+            cohort_df = pd.concat([roster[identity_columns], cohort_scores[['total']].rename(columns={'total': 'Середній бал НМТ'})], axis=1)
+
+            with span('load_university_data', cached=True):
+                cohort_offers_df = load_university_data("src/konkurs_NMT.csv", offers_source_version("src/konkurs_NMT.csv"))
+            if cohort_offers_df is not None and not cohort_offers_df.empty:
+                st.subheader("Пропозиції для аналізу")
+                cohort_filter_cols = st.columns(2)
+                with cohort_filter_cols[0]:
+                    cohort_universities = st.multiselect("Університет(и):", sorted(cohort_offers_df['Університет'].unique()),
+                                                         placeholder="Всі університети", key="cohort_uni_filter")
+                if cohort_universities:
+                    cohort_offers_df = cohort_offers_df[cohort_offers_df['Університет'].isin(cohort_universities)]
+                with cohort_filter_cols[1]:
+                    cohort_specialties = st.multiselect("Спеціальність(і):", sorted(cohort_offers_df['Спеціальність'].dropna().unique()),
+                                                        placeholder="Всі спеціальності", key="cohort_spec_filter")
+                if cohort_specialties:
+                    cohort_offers_df = cohort_offers_df[cohort_offers_df['Спеціальність'].isin(cohort_specialties)]
+
+                # Матриця абітурієнти x пропозиції класифікується частинами; зберігаються лише підсумки
+                cohort_totals = cohort_scores['total'].to_numpy()
+                with span('cohort_chances', cells=len(cohort_totals) * len(cohort_offers_df)):
+                    per_offer_counts, per_applicant_counts = cohort_band_counts(
+                        cohort_totals, cohort_offers_df['Мін_Бал'], cohort_offers_df['Сер_Бал'], cohort_offers_df['Макс_Бал'])
+                present_bands = np.flatnonzero(per_offer_counts.sum(axis=0))
+                band_columns = CHANCE_LABELS[present_bands].tolist()
+                st.caption(f"{len(cohort_totals):,} абітурієнтів x {len(cohort_offers_df):,} пропозицій = "
+                           f"{len(cohort_totals) * len(cohort_offers_df):,} оцінок шансів.")
+
+                st.subheader("Абітурієнти: кількість пропозицій кожного рівня шансів")
+                st.dataframe(pd.concat([cohort_df, pd.DataFrame(per_applicant_counts[:, present_bands], columns=band_columns,
+                                                                 index=cohort_df.index)], axis=1),
+                             use_container_width=True, hide_index=True)
+
+                st.subheader("Пропозиції: скільки абітурієнтів досягає кожного рівня шансів")
+                offer_columns = [col for col in ['Університет', 'Спеціальність', 'Освітній_ступінь', 'Форма_навчання',
+                                                 'Вступ_на_основі', 'Мін_Бал', 'Сер_Бал', 'Макс_Бал'] if col in cohort_offers_df.columns]
+                offer_summary_df = pd.concat([cohort_offers_df[offer_columns].reset_index(drop=True),
+                                              pd.DataFrame(per_offer_counts[:, present_bands], columns=band_columns)], axis=1)
+                # Спершу пропозиції, де найбільше абітурієнтів мають бал не нижчий за мінімальний (рівні 0-5)
+                offer_summary_df = offer_summary_df.iloc[np.argsort(-per_offer_counts[:, :6].sum(axis=1), kind='stable')]
+                st.dataframe(offer_summary_df, height=500, use_container_width=True, hide_index=True)
+
+                if len(cohort_offers_df) <= COHORT_MATRIX_MAX_OFFERS:
+                    st.subheader("Матриця шансів: абітурієнт x пропозиція")
+                    cohort_matrix = chance_matrix(cohort_totals, cohort_offers_df['Мін_Бал'], cohort_offers_df['Сер_Бал'],
+                                                  cohort_offers_df['Макс_Бал'])
+                    # Пропозиції згруповані за ключовими колонками, тож їхнє поєднання унікальне
+                    offer_key_columns = [col for col in offer_columns if not col.endswith('_Бал')]
+                    offer_names = cohort_offers_df[offer_key_columns].astype(str).agg(" / ".join, axis=1).tolist()
+                    st.dataframe(pd.concat([cohort_df, pd.DataFrame(CHANCE_LABELS[cohort_matrix], columns=offer_names,
+                                                                     index=cohort_df.index)], axis=1),
+                                 use_container_width=True, hide_index=True)
+                else:
+                    st.info(f"Оберіть до {COHORT_MATRIX_MAX_OFFERS} пропозицій, щоб побачити повну матрицю шансів кожного абітурієнта.")
+            elif cohort_offers_df is None:
+                st.error("Не вдалося завантажити або обробити файл даних університетів: 'src/konkurs_NMT.csv'.")
+        elif cohort_models:
+            st.warning("Не всі моделі НМТ завантажені - бали когорти не можуть бути розраховані.")
+
+st.sidebar.header("🧠 Моделі НМТ")
+for subject_display_name, config_item in SUBJECTS_CONFIG.items():
+    status, error = model_status(config_item["key"])
+    if status == MODEL_LOADED:
+        st.sidebar.markdown(f"✅ {subject_display_name}: завантажена")
+    elif status == MODEL_FAILED:
+        st.sidebar.markdown(f"❌ {subject_display_name}: помилка ({error})")
+    else:
+        st.sidebar.markdown(f"⏳ {subject_display_name}: завантажиться при першому розрахунку")
+
 st.sidebar.header("ℹ️ Про проєкт")
 st.sidebar.info(
     """
@@ -518,4 +607,9 @@ st.sidebar.info(
 )
 st.sidebar.markdown("---")
 st.sidebar.markdown("Бажаємо успіху на НМТ та при вступі!")
-st.sidebar.caption("Зроблено з ❤️ для українських абітурієнтів!")
\ No newline at end of file
+st.sidebar.caption("Зроблено з ❤️ для українських абітурієнтів!")
+
+# Час рендеру: перший (холодний) рендер процесу та поточний
+render_ms = (time.perf_counter() - page_render_started) * 1000
+cold_render_ms = render_timings().setdefault('cold_render_ms', render_ms)
+st.sidebar.caption(f"⏱️ Рендер сторінки: {render_ms:.0f} мс (перший рендер процесу: {cold_render_ms:.0f} мс)")
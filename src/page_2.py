@@ -3,33 +3,67 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import os
+
+from aggregates import (AGGREGATES_DIR, COUNT_COL, DEFAULT_CHUNKSIZE, FoldedAggregates, IndexedAggregates,
+                        counts_by, has_aggregates, read_aggregates, stream_aggregates)
+from artifacts import fetch_artifact
+from charts import figure_json_bytes, histogram_with_box
+from dataset import load_main_dataset, main_df_content_version, main_df_source
+from telemetry import span, cache_miss
 # import datetime # Not explicitly used in the provided snippet, but can be kept if needed elsewhere
 
 st.set_page_config(layout="wide", page_title="Дашборди аналізу даних тестування")
 
 
-@st.cache_data  # Декоратор Streamlit для кешування даних
+# Потоковий режим: агрегати згортаються з файлу частинами, без завантаження main_df у пам'ять
+STREAMING_AGGREGATION = os.environ.get('DASHBOARD_AGGREGATION', 'memory') == 'streaming'
+
+
+@st.cache_resource
+def load_materialized_aggregates(aggregates_dir, source_version):
+    """Матеріалізовані таблиці агрегатів (aggregates.py --output), якщо вони побудовані з поточних даних."""
+    cache_miss()
+    totals = read_aggregates(source_version, aggregates_dir)
+    return None if totals is None else FoldedAggregates(totals)
+
+
+@st.cache_resource(show_spinner="Побудова індексів фільтрів...", max_entries=1)
+def load_indexed_aggregates(_dataset, dataset_version):
+    """Бітові індекси фільтрів та закодовані виміри спільного main_df (один раз на версію даних)."""
+    cache_miss()
+    return IndexedAggregates(_dataset.frame)
+
+
+@st.cache_resource(show_spinner="Потокова обробка даних тестування...")
+def load_streamed_aggregates(source_path, source_version):
+    """Агрегати дашбордів, згорнуті з файлу групами рядків (пам'ять обмежена розміром частини)."""
+    cache_miss()
+    return FoldedAggregates(stream_aggregates(source_path, DEFAULT_CHUNKSIZE))
+
+
 def load_and_preprocess_data(file_path):
     """
-    Завантажує дані з CSV файлу, виконує початкову обробку (наприклад, конвертацію дат)
-    та кешує результат.
+    Повертає джерело агрегатів дашбордів (aggregates.py): матеріалізовані таблиці, якщо вони
+    актуальні, інакше бітові індекси спільного для всіх сторінок main_df або, у потоковому
+    режимі, агрегати, згорнуті з файлу частинами.
     """
     if 'dev' in os.environ['ENVIROMENT_MODE']:
         st.warning("Завантаження моделей НМТ вимкнено в режимі розробки. "
                    "Перевірте, чи встановлено змінну оточення ENVIROMENT_MODE у 'prod' для завантаження моделей.")
-    elif 'prod' in os.environ['ENVIROMENT_MODE']:
-        st.info("Завантаження моделей НМТ увімкнено 'prod'.")
-        import boto3
-        s3 = boto3.client('s3')
-        s3.download_file('nmt', 'main_df.csv', 'src/main_df.csv')
 
     try:
-        df = pd.read_csv(file_path)
-        # Початкова обробка даних, яка виконується лише один раз
-        if 'testdate' in df.columns:
-            df['testdate'] = pd.to_datetime(df['testdate'], errors='coerce')
-        # Сюди можна додати іншу статичну обробку, якщо вона потрібна для main_df
-        return df
+        if 'prod' in os.environ['ENVIROMENT_MODE']:
+            fetch_artifact(file_path)
+        source_path, source_version = main_df_source(file_path)
+        # Хеш вмісту рахується лише якщо таблиці побудовані (і далі - лише після зміни файлу)
+        if has_aggregates(AGGREGATES_DIR):
+            materialized = load_materialized_aggregates(AGGREGATES_DIR, main_df_content_version(file_path))
+            if materialized is not None:
+                return materialized
+        if STREAMING_AGGREGATION:
+            return load_streamed_aggregates(source_path, source_version)
+        dataset = load_main_dataset(file_path)
+        return load_indexed_aggregates(dataset, dataset.version)
     except FileNotFoundError:
         st.error(f"Помилка: Файл '{file_path}' не знайдено. Перевірте шлях до файлу.")
         st.stop()  # Зупиняємо виконання, якщо файл не знайдено
@@ -37,11 +71,14 @@ def load_and_preprocess_data(file_path):
         st.error(f"Помилка при завантаженні або початковій обробці даних з '{file_path}': {e}")
         st.stop() # Зупиняємо виконання при інших помилках завантаження/обробки
 
-# --- Завантаження основних даних з використанням кешованої функції ---
-main_df = load_and_preprocess_data('src/main_df.csv')
+# --- Завантаження агрегатів з використанням кешованої функції ---
+with span('load_aggregates', cached=True):
+    dashboard_data = load_and_preprocess_data('src/main_df.csv')
+aggregates = dashboard_data.totals
+total_rows = int(aggregates['rows'][COUNT_COL].sum())
 
 # --- Додаткова перевірка після завантаження (опціонально, але корисно) ---
-if main_df.empty:
+if total_rows == 0:
     st.warning("Увага: Файл даних ('src/main_df.csv') завантажено, але він порожній (не містить записів). Деякі елементи дашборду можуть не відображатися або відображатися некоректно.")
    
 st.title("🚀 Аналітичні дашборди на основі даних тестування")
@@ -51,18 +88,15 @@ st.markdown("Огляд даних минулих років. Використо
 # --- Sidebar Filters ---
 st.sidebar.header("⚙️ Глобальні фільтри")
 
-# Ensure main_df columns are available before using them for filters
-if 'exam_year' not in main_df.columns or 'regname' not in main_df.columns:
-    st.sidebar.error("Критична помилка: Необхідні колонки ('exam_year', 'regname') відсутні в даних.")
-    st.stop()
-
+# Колонки фільтрів ('exam_year', 'regname') є ключами всіх агрегатів, тож вони завжди присутні
+exam_years = aggregates['rows']['exam_year'].dropna().unique()
 selected_exam_year = st.sidebar.multiselect(
     "Виберіть рік іспиту:",
-    options=sorted(main_df['exam_year'].unique(), reverse=True),
-    default=list(sorted(main_df['exam_year'].unique())) # Ensure default is a list
+    options=sorted(exam_years, reverse=True),
+    default=list(sorted(exam_years)) # Ensure default is a list
 )
 
-unique_regions = sorted(main_df['regname'].unique())
+unique_regions = sorted(aggregates['rows']['regname'].dropna().unique())
 selected_region = st.sidebar.multiselect(
     "Виберіть регіон:",
     options=unique_regions,
@@ -70,35 +104,39 @@ selected_region = st.sidebar.multiselect(
 )
 
 # --- Filter Data ---
-filtered_df = main_df.copy()
-if selected_exam_year:
-    filtered_df = filtered_df[filtered_df['exam_year'].isin(selected_exam_year)]
-if selected_region: 
-    filtered_df = filtered_df[filtered_df['regname'].isin(selected_region)]
-
-# --- CENTRALIZED 'Вік' (AGE) CALCULATION ---
-age_calculation_possible = True
-if not filtered_df.empty:
-    if 'birth' in filtered_df.columns and 'exam_year' in filtered_df.columns:
-        birth_years = pd.to_numeric(filtered_df['birth'], errors='coerce')
-        exam_years_numeric = pd.to_numeric(filtered_df['exam_year'], errors='coerce')
-        # Add 'Вік' column to filtered_df
-        filtered_df['Вік'] = exam_years_numeric - birth_years
-    else:
-        st.sidebar.warning("Колонки 'birth' або 'exam_year' відсутні. Віковий розподіл не буде розраховано.")
-        # Add an empty 'Вік' column with NaN to prevent KeyErrors if plots expect it
-        filtered_df['Вік'] = np.nan 
-        age_calculation_possible = False
-else:
-    # If filtered_df is empty, still ensure 'Вік' column exists if other code expects it
-    if 'Вік' not in filtered_df.columns:
-         filtered_df['Вік'] = pd.Series(dtype='float64')
+# Вибір - OR бітових карт значень у колонці та AND між колонками (або сума груп агрегатів
+# у потоковому режимі); відфільтрований кадр не створюється
+with span('filter_select', years=len(selected_exam_year), regions=len(selected_region)):
+    filtered = dashboard_data.select(selected_exam_year, selected_region)
+filtered_rows = int(filtered['rows'][COUNT_COL].sum())
+
+# --- 'Вік' (AGE) ---
+# Кількості за віком (exam_year - birth) підраховані разом з іншими агрегатами
+age_calculation_possible = 'age' in filtered
+if filtered_rows and not age_calculation_possible:
+    st.sidebar.warning("Колонки 'birth' або 'exam_year' відсутні. Віковий розподіл не буде розраховано.")
+
+
+# Розмір JSON усіх графіків сторінки, переданих у браузер під час цього рендеру
+figure_payload_bytes = []
+
+def show_chart(fig):
+    with span('render_chart'):
+        figure_payload_bytes.append(figure_json_bytes(fig))
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def dimension_counts(name):
+    """Кількості за виміром `name` для вибраних фільтрів, за спаданням (як value_counts)."""
+    if name not in filtered:
+        return pd.DataFrame(columns=[name, COUNT_COL])
+    return counts_by(filtered[name], [name]).sort_values(COUNT_COL, ascending=False, kind='stable')
 
 
 # --- Main Page Content ---
-if filtered_df.empty and not (selected_exam_year or selected_region): # Check if empty due to no data initially
+if filtered_rows == 0 and not (selected_exam_year or selected_region): # Check if empty due to no data initially
     st.warning("😔 Вхідний файл даних порожній або не містить записів.")
-elif filtered_df.empty: # Empty due to filters
+elif filtered_rows == 0: # Empty due to filters
     st.warning("😔 Немає даних для вибраних фільтрів. Спробуйте змінити параметри.")
 else:
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -109,40 +147,42 @@ else:
     ])
 
     # --- 1. Демографічний огляд ---
-    with tab1:
+    # Спан вкладки охоплює підрахунок, побудову та рендер її графіків
+    with tab1, span('tab_demography'):
         st.header("🧑‍🤝‍🧑 Демографічний огляд учасників")
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("Розподіл за статтю (`sextypename`)")
-            if 'sextypename' in filtered_df.columns and not filtered_df['sextypename'].dropna().empty:
-                gender_counts = filtered_df['sextypename'].value_counts().reset_index()
+            gender_counts = dimension_counts('sextypename')
+            if not gender_counts.empty:
                 gender_counts.columns = ['Стать', 'Кількість']
                 fig_gender = px.pie(gender_counts, values='Кількість', names='Стать', title="Співвідношення за статтю", hole=0.3)
                 fig_gender.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig_gender, use_container_width=True)
+                show_chart(fig_gender)
             else:
                 st.info("Немає даних для розподілу за статтю.")
 
             st.subheader("Розподіл за типом населеного пункту (`settlement_type`)")
-            if 'settlement_type' in filtered_df.columns and not filtered_df['settlement_type'].dropna().empty:
-                settlement_counts = filtered_df['settlement_type'].value_counts().reset_index()
+            settlement_counts = dimension_counts('settlement_type')
+            if not settlement_counts.empty:
                 settlement_counts.columns = ['Тип населеного пункту', 'Кількість']
                 fig_settlement = px.bar(settlement_counts, x='Тип населеного пункту', y='Кількість',
                                         title="Учасники за типом населеного пункту", color='Тип населеного пункту',
                                         labels={'Кількість':'Кількість учасників'})
-                st.plotly_chart(fig_settlement, use_container_width=True)
+                show_chart(fig_settlement)
             else:
                 st.info("Немає даних для розподілу за типом населеного пункту.")
 
         with col2: 
             st.subheader("Віковий розподіл (на основі `birth` та `exam_year`)")
-            if age_calculation_possible and 'Вік' in filtered_df.columns and not filtered_df['Вік'].isnull().all():
-                age_plot_data = filtered_df.dropna(subset=['Вік']).copy()
+            if age_calculation_possible and not filtered['age'].empty:
+                age_plot_data = counts_by(filtered['age'], ['age']).rename(columns={'age': 'Вік'})
                 if not age_plot_data.empty:
-                    age_plot_data['Вік'] = age_plot_data['Вік'].astype(int)
-                    fig_age = px.histogram(age_plot_data, x='Вік', nbins=30, title="Розподіл учасників за віком", marginal="box")
-                    st.plotly_chart(fig_age, use_container_width=True)
+                    # Кошики та п'ять чисел бокс-плоту рахуються на сервері - у браузер іде лише підсумок
+                    fig_age = histogram_with_box(age_plot_data['Вік'], age_plot_data[COUNT_COL], 'Вік', 'Кількість учасників',
+                                                 "Розподіл учасників за віком", nbins=30)
+                    show_chart(fig_age)
                 else:
                     st.info("Немає дійсних даних для вікового розподілу після обробки.")
             elif not age_calculation_possible:
@@ -151,86 +191,81 @@ else:
                 st.info("Немає даних для вікового розподілу.")
 
             st.subheader("Розподіл за регіоном (`regname`)")
-            if 'regname' in filtered_df.columns and not filtered_df['regname'].dropna().empty:
-                region_counts = filtered_df['regname'].value_counts().reset_index()
+            region_counts = dimension_counts('regname')
+            if not region_counts.empty:
                 region_counts.columns = ['Регіон', 'Кількість']
                 fig_region = px.bar(region_counts.sort_values('Кількість', ascending=False),
                                     x='Регіон', y='Кількість', title="Кількість учасників по регіонах", color='Регіон')
-                st.plotly_chart(fig_region, use_container_width=True)
+                show_chart(fig_region)
             else:
                 st.info("Немає даних для розподілу за регіоном.")
     
     # --- 2. Аналіз тенденцій тестування ---
-    with tab2:
+    with tab2, span('tab_trends'):
         st.header("📈 Аналіз тенденцій тестування")
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("Кількість тестувань за роками (`exam_year`)")
-            if 'exam_year' in main_df.columns and not main_df['exam_year'].dropna().empty:
-                yearly_tests_all_data = main_df['exam_year'].value_counts().sort_index().reset_index()
+            yearly_tests_all_data = counts_by(aggregates['rows'], ['exam_year']).sort_values('exam_year')
+            if not yearly_tests_all_data.empty:
                 yearly_tests_all_data.columns = ['Рік', 'Кількість']
                 fig_yearly_tests = px.line(yearly_tests_all_data, x='Рік', y='Кількість', markers=True, title="Динаміка кількості тестувань по роках")
                 fig_yearly_tests.update_xaxes(type='category') 
-                st.plotly_chart(fig_yearly_tests, use_container_width=True)
+                show_chart(fig_yearly_tests)
             else:
                 st.info("Немає даних 'exam_year' для відображення динаміки по роках.")
 
             st.subheader("Розподіл за типом реєстрації (`regtypename`)")
-            if 'regtypename' in filtered_df.columns and not filtered_df['regtypename'].dropna().empty:
-                regtype_counts = filtered_df['regtypename'].value_counts().reset_index()
+            regtype_counts = dimension_counts('regtypename')
+            if not regtype_counts.empty:
                 regtype_counts.columns = ['Тип реєстрації', 'Кількість']
                 fig_regtype = px.bar(regtype_counts, x='Тип реєстрації', y='Кількість',
                                      title="Учасники за типом реєстрації", color='Тип реєстрації')
-                st.plotly_chart(fig_regtype, use_container_width=True)
+                show_chart(fig_regtype)
             else:
                 st.info("Немає даних 'regtypename' для розподілу за типом реєстрації.")
 
         with col2:
             st.subheader("Кількість тестувань за датою (`testdate`)")
-            if 'testdate' in filtered_df.columns and not filtered_df['testdate'].dropna().empty:
-                if pd.api.types.is_datetime64_any_dtype(filtered_df['testdate']):
-                    daily_tests = filtered_df.groupby(filtered_df['testdate'].dt.date).size().reset_index(name='Кількість')
-                    daily_tests.columns = ['Дата', 'Кількість']
-                    fig_daily_tests = px.line(daily_tests, x='Дата', y='Кількість', markers=True, title="Кількість тестувань за днями (для вибраних фільтрів)")
-                    st.plotly_chart(fig_daily_tests, use_container_width=True)
-                else:
-                    st.info("Колонка 'testdate' не є типом datetime. Неможливо згрупувати за датою.")
+            if 'testdate' in filtered and not filtered['testdate'].empty:
+                daily_tests = counts_by(filtered['testdate'], ['testdate']).sort_values('testdate')
+                daily_tests.columns = ['Дата', 'Кількість']
+                fig_daily_tests = px.line(daily_tests, x='Дата', y='Кількість', markers=True, title="Кількість тестувань за днями (для вибраних фільтрів)")
+                show_chart(fig_daily_tests)
             else:
                 st.info("Немає даних 'testdate' для щоденної динаміки.")
 
             st.subheader("Розподіл за статтю по роках (фільтровані дані)")
-            if 'exam_year' in filtered_df.columns and 'sextypename' in filtered_df.columns and \
-               not filtered_df[['exam_year', 'sextypename']].dropna().empty:
-                gender_by_year = filtered_df.groupby(['exam_year', 'sextypename']).size().reset_index(name='Кількість')
+            if 'sextypename' in filtered:
+                gender_by_year = counts_by(filtered['sextypename'], ['exam_year', 'sextypename']).sort_values(['exam_year', 'sextypename'])
                 if not gender_by_year.empty:
                     fig_gender_year = px.bar(gender_by_year, x='exam_year', y='Кількість', color='sextypename',
                                              barmode='group', title="Розподіл за статтю по роках (для вибраних фільтрів)",
                                              labels={'exam_year':'Рік іспиту', 'sextypename':'Стать'})
                     fig_gender_year.update_xaxes(type='category')
-                    st.plotly_chart(fig_gender_year, use_container_width=True)
+                    show_chart(fig_gender_year)
                 else:
                     st.info("Немає даних для розподілу статі по роках.")
             else:
                 st.info("Відсутні колонки 'exam_year' або 'sextypename' для розподілу статі по роках.")
                 
     # --- 3. Географічний аналіз ---
-    with tab3:
+    with tab3, span('tab_geography'):
         st.header("🗺️ Географічний аналіз")
         # ... (Your existing code for tab3, ensure checks for column existence and empty data) ...
         # Example for one plot in tab3:
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Учасники за типом н.п. в розрізі регіонів (`regname`, `settlement_type`)")
-            if 'regname' in filtered_df.columns and 'settlement_type' in filtered_df.columns and \
-               not filtered_df[['regname', 'settlement_type']].dropna().empty:
-                region_settlement_counts = filtered_df.groupby(['regname', 'settlement_type']).size().reset_index(name='Кількість')
+            if 'settlement_type' in filtered:
+                region_settlement_counts = counts_by(filtered['settlement_type'], ['regname', 'settlement_type']).sort_values(['regname', 'settlement_type'])
                 if not region_settlement_counts.empty:
                     fig_region_settlement = px.bar(region_settlement_counts, x='regname', y='Кількість',
                                                    color='settlement_type', title="Розподіл типів н.п. по регіонах",
                                                    labels={'regname':'Регіон', 'settlement_type':'Тип населеного пункту'},
-                                                   category_orders={"regname": region_settlement_counts.groupby('regname')['Кількість'].sum().sort_values(ascending=False).index.tolist()})
-                    st.plotly_chart(fig_region_settlement, use_container_width=True)
+                                                   category_orders={"regname": region_settlement_counts.groupby('regname', observed=True)['Кількість'].sum().sort_values(ascending=False).index.tolist()})
+                    show_chart(fig_region_settlement)
                 else:
                     st.info("Немає даних для розподілу типів населених пунктів по регіонах.")
             else:
@@ -244,6 +279,7 @@ else:
 
     # --- Sidebar Footer ---
     st.sidebar.markdown("---")
-    st.sidebar.info(f"📊 Показано дані для **{filtered_df.shape[0]:,}** записів з **{main_df.shape[0]:,}** загальних.")
+    st.sidebar.info(f"📊 Показано дані для **{filtered_rows:,}** записів з **{total_rows:,}** загальних.")
+    st.sidebar.caption(f"📦 Графіки: {len(figure_payload_bytes)} шт., {sum(figure_payload_bytes) / 1024:,.1f} КБ JSON")
     st.sidebar.markdown("ℹ️ *Дані виділені з відкритих даних УЦОЯО 2016-2024 років*")
     st.sidebar.markdown("🔗 [Джерело даних](https://testportal.gov.ua/)")
\ No newline at end of file
@@ -0,0 +1,317 @@
+"""
+HTTP-сервіс прогнозів НМТ без інтерфейсу Streamlit (tornado).
+
+Моделі SUBJECTS_CONFIG завантажуються один раз при старті. Запити, що надійшли
+протягом короткого вікна (--max-delay-ms) або до заповнення пакета (--max-batch),
+об'єднуються: кожна модель викликається один раз на пакет у окремому потоці,
+тож цикл подій продовжує приймати запити, поки рахується попередній пакет.
+
+    POST /predict   {"exam_year": 2024, "birth": 2007, "sextypename": "жіноча",
+                     "regname": "...", "settlement_type": "...", "eotypename": "...",
+                     "o12": {"math": 9.5}, "w": 0.5, "k_stress": 1.0}
+    GET  /metrics   глибина черги, розміри пакетів та перцентилі затримки (текст Prometheus)
+    GET  /healthz
+
+    python src/prediction_service.py --port 8502 --max-batch 256 --max-delay-ms 5
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from scoring import (SUBJECTS_CONFIG, FEATURE_COLS, MultiSubjectPredictor, get_model, calculate_score_balanced,
+                     calculate_score_individual_adjusted, calculate_score_cautious_stress)
+
+DEFAULT_PORT = 8502
+MAX_BATCH_SIZE = 256
+MAX_DELAY_MS = 5.0
+# Скільки останніх значень зберігається для перцентилів
+METRICS_WINDOW = 10_000
+QUANTILES = (0.5, 0.95, 0.99)
+# Ознаки-роки (цілі числа); решта FEATURE_COLS - рядки
+YEAR_COLS = ('exam_year', 'birth')
+# Попередження sklearn на кожен пакет (енкодер передає моделі масив без назв колонок)
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+class ServiceMetrics:
+    """Лічильники та ковзні вікна розмірів пакетів і затримок для /metrics."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.latency_sum = 0.0
+
+    def observe_request(self, seconds, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latency_sum += seconds
+            self.latencies.append(seconds)
+
+    def observe_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes.append(size)
+
+    def snapshot(self, queue_depth):
+        """Метрики в текстовому форматі Prometheus."""
+        with self.lock:
+            latencies = np.array(self.latencies)
+            batch_sizes = np.array(self.batch_sizes)
+            lines = [
+                '# HELP nmt_predict_queue_depth Запити, що чекають на формування пакета.',
+                '# TYPE nmt_predict_queue_depth gauge',
+                f'nmt_predict_queue_depth {queue_depth}',
+                '# HELP nmt_predict_latency_seconds Затримка запиту /predict (останні запити).',
+                '# TYPE nmt_predict_latency_seconds summary',
+            ]
+            for q in QUANTILES:
+                value = np.quantile(latencies, q) if len(latencies) else float('nan')
+                lines.append(f'nmt_predict_latency_seconds{{quantile="{q}"}} {value:.6f}')
+            lines += [f'nmt_predict_latency_seconds_sum {self.latency_sum:.6f}',
+                      f'nmt_predict_latency_seconds_count {self.requests}',
+                      '# HELP nmt_predict_batch_size Запитів в одному виклику моделей (останні пакети).',
+                      '# TYPE nmt_predict_batch_size summary']
+            for q in QUANTILES:
+                value = np.quantile(batch_sizes, q) if len(batch_sizes) else float('nan')
+                lines.append(f'nmt_predict_batch_size{{quantile="{q}"}} {value:g}')
+            lines += [f'nmt_predict_batch_size_count {self.batches}',
+                      '# HELP nmt_predict_errors_total Запити, що завершилися помилкою.',
+                      '# TYPE nmt_predict_errors_total counter',
+                      f'nmt_predict_errors_total {self.errors}']
+        return '\n'.join(lines) + '\n'
+
+
+class MicroBatcher:
+    """
+    Об'єднує рядки ознак з одночасних запитів у пакети. Пакет відправляється, коли в ньому
+    max_batch_size рядків або минуло max_delay секунд від першого рядка. Моделі рахують
+    пакети по одному у фоновому потоці; поки пакет рахується, нові запити накопичуються
+    і відправляються наступним пакетом одразу після нього.
+    """
+
+    def __init__(self, models, metrics, max_batch_size=MAX_BATCH_SIZE, max_delay=MAX_DELAY_MS / 1000):
+        # Ознаки пакета кодуються один раз для всіх моделей зі спільною підготовкою
+        self.predictor = MultiSubjectPredictor(models)
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.pending = []
+        self._flush_handle = None
+        self._in_flight = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+
+    @property
+    def queue_depth(self):
+        return len(self.pending)
+
+    def submit(self, features):
+        """Future з {subject_key: прогноз} для одного рядка ознак (dict за FEATURE_COLS)."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((features, future))
+        if self._in_flight:
+            return future
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._in_flight or not self.pending:
+            return
+        batch, self.pending = self.pending[:self.max_batch_size], self.pending[self.max_batch_size:]
+        self._in_flight = True
+        asyncio.ensure_future(self._run(batch))
+
+    def _predict(self, rows):
+        return self.predictor.predict(pd.DataFrame(rows, columns=FEATURE_COLS))
+
+    async def _run_rows(self, batch):
+        loop = asyncio.get_running_loop()
+        for features, future in batch:
+            try:
+                predictions = await loop.run_in_executor(self._executor, self._predict, [features])
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result({key: float(values[0]) for key, values in predictions.items()})
+
+    async def _run(self, batch):
+        self.metrics.observe_batch(len(batch))
+        loop = asyncio.get_running_loop()
+        try:
+            predictions = await loop.run_in_executor(self._executor, self._predict, [features for features, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Помилка одного рядка не повинна зачепити решту пакета - рахуємо рядки окремо
+                await self._run_rows(batch)
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(e)
+        else:
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result({key: float(values[i]) for key, values in predictions.items()})
+        finally:
+            self._in_flight = False
+        # Запити, що надійшли під час розрахунку, вже чекали - відправляємо їх без затримки
+        self._flush()
+
+
+def _number(value, field):
+    """Скінченне число з JSON (не bool); ValueError для будь-якого іншого значення."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"поле {field} має бути числом")
+    return value
+
+
+def parse_request(body):
+    """
+    Ознаки, шкільні оцінки та параметри формул із JSON-тіла запиту. Типи перевіряються
+    до постановки в пакет, щоб некоректний запит не зламав розрахунок сусідніх; ValueError,
+    якщо поля відсутні або мають неправильний тип.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise ValueError("тіло запиту має бути JSON-об'єктом")
+    if not isinstance(payload, dict):
+        raise ValueError("тіло запиту має бути JSON-об'єктом")
+    missing = [col for col in FEATURE_COLS if payload.get(col) is None]
+    if missing:
+        raise ValueError(f"бракує полів: {', '.join(missing)}")
+    features = {}
+    for col in FEATURE_COLS:
+        value = payload[col]
+        if col in YEAR_COLS:
+            value = _number(value, col)
+            if value != int(value):
+                raise ValueError(f"поле {col} має бути цілим роком")
+            features[col] = int(value)
+        elif isinstance(value, str):
+            features[col] = value
+        else:
+            raise ValueError(f"поле {col} має бути рядком")
+    o12 = payload.get('o12') or {}
+    if not isinstance(o12, dict):
+        raise ValueError("поле o12 має бути об'єктом {предмет: оцінка}")
+    grades = {str(key): float(_number(value, f"o12.{key}")) for key, value in o12.items()}
+    w = float(_number(payload.get('w', 0.5), 'w'))
+    k_stress = float(_number(payload.get('k_stress', 1.0), 'k_stress'))
+    return features, grades, w, k_stress
+
+
+def score_response(predictions, grades, w, k_stress):
+    """Прогнози та, для предметів зі шкільною оцінкою, три формули калькулятора і їхнє середнє."""
+    subjects = {}
+    for key, predicted in predictions.items():
+        subject = {'prediction': predicted}
+        if key in grades:
+            o_12 = grades[key]
+            scores = (calculate_score_balanced(predicted, o_12, w), calculate_score_individual_adjusted(predicted, o_12),
+                      calculate_score_cautious_stress(predicted, o_12, k_stress))
+            subject.update(balanced=float(scores[0]), individual=float(scores[1]), cautious=float(scores[2]),
+                           average=float(sum(scores) / 3))
+        subjects[key] = subject
+    averages = [subject['average'] for subject in subjects.values() if 'average' in subject]
+    return {'subjects': subjects, 'total': sum(averages) / len(averages) if averages else None}
+
+
+class PredictHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher, metrics):
+        self.batcher = batcher
+        self.metrics = metrics
+
+    async def post(self):
+        start = time.perf_counter()
+        try:
+            features, grades, w, k_stress = parse_request(self.request.body)
+        except (ValueError, TypeError) as e:
+            self.metrics.observe_request(time.perf_counter() - start, ok=False)
+            self.set_status(400)
+            self.write({'error': str(e)})
+            return
+        try:
+            predictions = await self.batcher.submit(features)
+        except Exception as e:
+            self.metrics.observe_request(time.perf_counter() - start, ok=False)
+            self.set_status(500)
+            self.write({'error': str(e)})
+            return
+        self.write(score_response(predictions, grades, w, k_stress))
+        self.metrics.observe_request(time.perf_counter() - start)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher, metrics):
+        self.batcher = batcher
+        self.metrics = metrics
+
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(self.metrics.snapshot(self.batcher.queue_depth))
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write({'status': 'ok'})
+
+
+def models_config(models_dir=None, subject_config=SUBJECTS_CONFIG):
+    """SUBJECTS_CONFIG, у якому файли моделей шукаються в `models_dir` (якщо його задано)."""
+    if models_dir is None:
+        return subject_config
+    return {name: dict(config, model_path=os.path.join(models_dir, os.path.basename(config["model_path"])))
+            for name, config in subject_config.items()}
+
+
+def make_app(models, max_batch_size=MAX_BATCH_SIZE, max_delay_ms=MAX_DELAY_MS):
+    metrics = ServiceMetrics()
+    batcher = MicroBatcher(models, metrics, max_batch_size, max_delay_ms / 1000)
+    handler_args = {'batcher': batcher, 'metrics': metrics}
+    return tornado.web.Application([
+        (r"/predict", PredictHandler, handler_args),
+        (r"/metrics", MetricsHandler, handler_args),
+        (r"/healthz", HealthHandler),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервіс прогнозів НМТ з об'єднанням запитів у пакети.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="максимум запитів в одному пакеті")
+    parser.add_argument("--max-delay-ms", type=float, default=MAX_DELAY_MS, help="вікно очікування пакета, мс")
+    parser.add_argument("--models-dir", help="каталог з файлами моделей (за замовчуванням - шляхи SUBJECTS_CONFIG)")
+    args = parser.parse_args(argv)
+
+    config = models_config(args.models_dir)
+    models = {item["key"]: get_model(item["key"], config) for item in config.values()}
+    app = make_app(models, args.max_batch, args.max_delay_ms)
+    app.listen(args.port)
+    print(f"Сервіс прогнозів слухає порт {args.port} (пакет до {args.max_batch}, вікно {args.max_delay_ms} мс)", flush=True)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Таблиця всіх можливих прогнозів моделей НМТ.
+
+Після utils.mapping_uk_to_en моделі бачать лише область, тип населеного пункту, тип закладу,
+стать і вік (exam_year - birth), а всі вони беруться зі скінченних списків форми калькулятора.
+Тому прогнози для всього простору ознак можна один раз порахувати через ті самі пайплайни
+і зберегти щільним масивом; калькулятор потім знаходить прогноз арифметикою індексів.
+
+    python src/prediction_table.py            # -> src/prediction_table.npz
+"""
+import hashlib
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scoring import (SUBJECTS_CONFIG, FEATURE_COLS, oblast_options, settlement_types_options,
+                     school_types_options, sextypename_options,
+                     EXAM_YEAR_MIN, EXAM_YEAR_MAX, BIRTH_MIN, BIRTH_MAX)
+
+PREDICTION_TABLE_PATH = "src/prediction_table.npz"
+
+# Осі таблиці у порядку вимірів масиву
+AGE_MIN = EXAM_YEAR_MIN - BIRTH_MAX
+AGE_MAX = EXAM_YEAR_MAX - BIRTH_MIN
+AXES = {
+    'regname': oblast_options,
+    'settlement_type': settlement_types_options,
+    'eotypename': school_types_options,
+    'sextypename': sextypename_options,
+    'age': list(range(AGE_MIN, AGE_MAX + 1)),
+}
+
+
+def model_fingerprint(model_path):
+    """SHA-256 файлу моделі: таблиця дійсна лише для тих моделей, з яких побудована."""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as model_file:
+        for block in iter(lambda: model_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_grid():
+    """Усі комбінації осей як вхідний кадр пайплайнів (FEATURE_COLS) у порядку C-розгортки масиву."""
+    grid = pd.MultiIndex.from_product(list(AXES.values()), names=list(AXES)).to_frame(index=False)
+    # Для кожного віку беремо пару (рік народження, рік НМТ) з допустимих діапазонів форми
+    grid['birth'] = np.maximum(BIRTH_MIN, EXAM_YEAR_MIN - grid['age'])
+    grid['exam_year'] = grid['birth'] + grid['age']
+    return grid[FEATURE_COLS]
+
+
+def build_prediction_table(subject_config=SUBJECTS_CONFIG, output_path=PREDICTION_TABLE_PATH, chunksize=200_000):
+    """Проганяє весь простір ознак через кожну модель і зберігає прогнози (float32)."""
+    grid = feature_grid()
+    shape = tuple(len(values) for values in AXES.values())
+    subject_keys, fingerprints, predictions = [], [], []
+    for config in subject_config.values():
+        model = joblib.load(config["model_path"])
+        subject_predictions = np.empty(len(grid), dtype=np.float32)
+        for start in range(0, len(grid), chunksize):
+            chunk = grid.iloc[start:start + chunksize]
+            subject_predictions[start:start + len(chunk)] = model.predict(chunk)
+        subject_keys.append(config["key"])
+        fingerprints.append(model_fingerprint(config["model_path"]))
+        predictions.append(subject_predictions.reshape(shape))
+    np.savez(output_path, predictions=np.stack(predictions), subject_keys=np.array(subject_keys),
+             fingerprints=np.array(fingerprints), age_min=AGE_MIN)
+    return output_path
+
+
+class PredictionTable:
+    """Прогнози всіх моделей для будь-якої комбінації ознак форми за O(1)."""
+
+    def __init__(self, path=PREDICTION_TABLE_PATH):
+        with np.load(path) as data:
+            self.predictions = data['predictions']
+            self.subject_keys = data['subject_keys'].tolist()
+            self.fingerprints = dict(zip(self.subject_keys, data['fingerprints'].tolist()))
+            self.age_min = int(data['age_min'])
+        self._positions = [{value: position for position, value in enumerate(values)}
+                           for name, values in AXES.items() if name != 'age']
+        self._n_ages = self.predictions.shape[-1]
+
+    def is_valid_for(self, subject_config=SUBJECTS_CONFIG):
+        """Чи побудована таблиця з поточних файлів моделей."""
+        try:
+            return all(self.fingerprints.get(config["key"]) == model_fingerprint(config["model_path"])
+                       for config in subject_config.values())
+        except OSError:
+            return False
+
+    def index(self, exam_year, birth, sextypename, regname, settlement_type, eotypename):
+        """Позиція комбінації ознак у таблиці або None, якщо вона поза простором таблиці."""
+        try:
+            region, settlement, school, sex = (positions[value] for positions, value in zip(
+                self._positions, (regname, settlement_type, eotypename, sextypename)))
+        except KeyError:
+            return None
+        age = int(exam_year) - int(birth) - self.age_min
+        if not 0 <= age < self._n_ages:
+            return None
+        return region, settlement, school, sex, age
+
+    def predict(self, exam_year, birth, sextypename, regname, settlement_type, eotypename):
+        """{subject_key: прогноз} для однієї комбінації ознак або None, якщо її немає в таблиці."""
+        position = self.index(exam_year, birth, sextypename, regname, settlement_type, eotypename)
+        if position is None:
+            return None
+        values = self.predictions[(slice(None),) + position]
+        return {key: float(value) for key, value in zip(self.subject_keys, values)}
+
+
+if __name__ == "__main__":
+    print(f"Записано {build_prediction_table(output_path=sys.argv[1] if len(sys.argv) > 1 else PREDICTION_TABLE_PATH)}")
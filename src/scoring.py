@@ -0,0 +1,208 @@
+import threading
+
+import joblib
+import numpy as np
+
+from telemetry import cache_miss
+
+# --- КОНФІГУРАЦІЯ ПРЕДМЕТІВ ТА ШЛЯХІВ ДО МОДЕЛЕЙ ---
+SUBJECTS_CONFIG = {
+    "Українська мова": {
+        "key": "new",
+        "model_path": "src/lgbm_model_new.pkl"
+    },
+    "Математика": {
+        "key": "math",
+        "model_path": "src/lgbm_model_math.pkl"
+    },
+    "Історія України": {
+        "key": "hist",
+        "model_path": "src/lgbm_model_hist.pkl"
+    }
+}
+
+# --- ОПЦІЇ ДЛЯ ВИПАДАЮЧИХ СПИСКІВ ---
+settlement_types_options = ['обласний центр', 'місто', 'село', 'смт', 'інше']
+school_types_options = [
+    'середня загальноосвітня школа', 'навчально-виховний комплекс', 'ліцей',
+    'спеціалізована школа', 'науковий ліцей', 'гімназія', 'заклад фахової передвищої освіти',
+    'заклад вищої освіти', 'колегіум', 'заклад професійної (професійно-технічної) освіти',
+    'загальноосвітня санаторна школа', "навчально-виховне об'єднання", 'ліцей із посиленою військово-фізичною підготовкою',
+    'спортивний ліцей', 'середня загальноосвітня школа-інтернат', 'спеціалізована школа-інтернат',
+    'спеціальна загальноосвітня школа', 'колегіум/колеж', 'військовий (військово-морський, військово-спортивний) ліцей',
+    'колеж', 'вечірня (змінна) школа', 'спеціальна загальноосвітня школа-інтернат',
+    'професійний ліцей відповідного профілю', 'початкова школа', 'Пенітенціарна установа',
+    'мистецький ліцей', 'спеціальна школа', 'вищий навчальний заклад III-IV рівнів акредитації',
+    'навчально-реабілітаційний центр', 'школа соціальної реабілітації', 'професійний коледж (коледж) спортивного профілю'
+]
+oblast_options = [
+    'Миколаївська область', 'Черкаська область', 'Чернігівська область', 'Запорізька область', 'Луганська область',
+    'Рівненська область', 'Одеська область', 'Київська область', 'Вінницька область', 'Тернопільська область',
+    'Дніпропетровська область', 'м.Київ', 'Львівська область', 'Хмельницька область', 'Харківська область',
+    'Кіровоградська область', 'Чернівецька область', 'Волинська область', 'Івано-Франківська область',
+    'Донецька область', 'Полтавська область', 'Херсонська область', 'Закарпатська область', 'Сумська область',
+    'Житомирська область'
+]
+sextypename_options = ['чоловіча', 'жіноча']
+
+# Допустимі роки у формі калькулятора
+EXAM_YEAR_MIN, EXAM_YEAR_MAX = 2022, 2070
+BIRTH_MIN, BIRTH_MAX = 1950, 2020
+
+# Вхідні ознаки моделей у порядку, в якому їх очікують пайплайни
+FEATURE_COLS = ['exam_year', 'birth', 'sextypename', 'regname', 'settlement_type', 'eotypename']
+
+# --- ЛІНИВЕ ЗАВАНТАЖЕННЯ МОДЕЛЕЙ ---
+# Кожна модель завантажується при першому використанні свого предмету і далі
+# спільна для всіх сесій процесу. mmap_mode='r' відображає масиви NumPy з pickle-файлу
+# у пам'ять (спільні сторінки кешу ОС для кількох процесів на одному хості) замість копіювання.
+MODEL_NOT_LOADED, MODEL_LOADED, MODEL_FAILED = "not_loaded", "loaded", "failed"
+_loaded_models = {}
+_model_errors = {}
+_models_lock = threading.Lock()
+
+def get_model(subject_key, subject_config=SUBJECTS_CONFIG):
+    """Модель предмету за ключем; завантажується лише під час першого виклику."""
+    model = _loaded_models.get(subject_key)
+    if model is not None:
+        return model
+    model_path = next(config["model_path"] for config in subject_config.values() if config["key"] == subject_key)
+    with _models_lock:
+        if subject_key not in _loaded_models:
+            cache_miss()
+            try:
+                _loaded_models[subject_key] = joblib.load(model_path, mmap_mode='r')
+                _model_errors.pop(subject_key, None)
+            except Exception as e:
+                _model_errors[subject_key] = e
+                raise
+        return _loaded_models[subject_key]
+
+def model_status(subject_key):
+    """Стан моделі без спроби її завантажити: (стан, помилка або None)."""
+    if subject_key in _loaded_models:
+        return MODEL_LOADED, None
+    if subject_key in _model_errors:
+        return MODEL_FAILED, _model_errors[subject_key]
+    return MODEL_NOT_LOADED, None
+
+
+# --- СПІЛЬНА ПІДГОТОВКА ОЗНАК ДЛЯ ВСІХ ПРЕДМЕТІВ ---
+# Пайплайни предметів відрізняються лише останнім кроком (LightGBM), а mapping_uk_to_en
+# та кодування навчені однаково. Якщо кроки до моделі збігаються після серіалізації,
+# ознаки кодуються один раз, і всі моделі рахуються на спільній закодованій матриці.
+_predictors = {}
+
+def _split_pipeline(model):
+    """(кроки підготовки ознак, фінальна модель) або (None, model), якщо це не Pipeline."""
+    steps = getattr(model, 'steps', None)
+    if not steps or len(steps) < 2:
+        return None, model
+    return model[:-1], model[-1]
+
+class MultiSubjectPredictor:
+    """
+    Прогнози кількох пайплайнів з однаковою підготовкою ознак за одне кодування.
+    Пайплайни з різною підготовкою (або не Pipeline) рахуються кожен своїм predict,
+    тож результат завжди збігається з окремими викликами model.predict(X).
+    """
+
+    def __init__(self, models):
+        self.models = dict(models)
+        self.groups = []  # [(кроки підготовки або None, {subject_key: модель})]
+        groups_by_digest = {}
+        for subject_key, model in self.models.items():
+            preprocessor, estimator = _split_pipeline(model)
+            try:
+                digest = None if preprocessor is None else joblib.hash(preprocessor)
+            except Exception:
+                digest = None
+            if digest is None:
+                self.groups.append((None, {subject_key: model}))
+                continue
+            if digest not in groups_by_digest:
+                groups_by_digest[digest] = (preprocessor, {})
+                self.groups.append(groups_by_digest[digest])
+            groups_by_digest[digest][1][subject_key] = estimator
+
+    @property
+    def n_encodings(self):
+        """Скільки разів кодуються ознаки на один виклик predict."""
+        return sum(preprocessor is not None for preprocessor, _ in self.groups)
+
+    def predict(self, X):
+        """{subject_key: масив прогнозів} для всіх рядків X (колонки FEATURE_COLS)."""
+        predictions = {}
+        for preprocessor, estimators in self.groups:
+            encoded = X if preprocessor is None else preprocessor.transform(X)
+            for subject_key, estimator in estimators.items():
+                predictions[subject_key] = estimator.predict(encoded)
+        return {subject_key: predictions[subject_key] for subject_key in self.models}
+
+def get_predictor(subject_keys=None, subject_config=SUBJECTS_CONFIG):
+    """Спільний для процесу MultiSubjectPredictor для предметів `subject_keys` (за замовчуванням - усіх)."""
+    keys = tuple(subject_keys) if subject_keys is not None else tuple(config["key"] for config in subject_config.values())
+    predictor = _predictors.get(keys)
+    if predictor is None:
+        predictor = MultiSubjectPredictor({key: get_model(key, subject_config) for key in keys})
+        _predictors[keys] = predictor
+    return predictor
+
+
+# --- КОНСТАНТИ ДЛЯ РОЗРАХУНКІВ ---
+NMT_MIN = 100.0
+NMT_MAX = 200.0
+S_MIN = 1.0
+S_MAX = 12.0
+DELTA_NMT = NMT_MAX - NMT_MIN
+DELTA_S = S_MAX - S_MIN
+O_AVG = 7.5
+K_SCALE = DELTA_NMT / DELTA_S
+
+
+# --- ФУНКЦІЇ РОЗРАХУНКУ БАЛІВ НМТ ---
+# Функції приймають як окремі числа, так і масиви NumPy (поелементно),
+# тому однаково використовуються в калькуляторі та в пакетному розрахунку.
+def _valid_grade(o_12):
+    return (S_MIN <= o_12) & (o_12 <= S_MAX)
+
+def calculate_score_balanced(b_model, o_12, w=0.5):
+    b_o12_norm = NMT_MIN + (o_12 - S_MIN) * (DELTA_NMT / DELTA_S)
+    final_score = np.where(_valid_grade(o_12), w * b_model + (1 - w) * b_o12_norm, b_model)
+    return np.clip(final_score, NMT_MIN, NMT_MAX)[()]
+
+def calculate_score_individual_adjusted(b_model, o_12):
+    b_adjusted = b_model + (o_12 - O_AVG) * K_SCALE
+    final_score = np.where(_valid_grade(o_12), b_adjusted, b_model)
+    return np.clip(final_score, NMT_MIN, NMT_MAX)[()]
+
+def calculate_score_cautious_stress(b_model, o_12, k_stress=1.0):
+    o_12_stressed = np.maximum(S_MIN, o_12 - k_stress)
+    b_o12_stressed_norm = NMT_MIN + (o_12_stressed - S_MIN) * (DELTA_NMT / DELTA_S)
+    final_score = np.where(_valid_grade(o_12), (b_model + b_o12_stressed_norm) / 2, b_model)
+    return np.clip(final_score, NMT_MIN, NMT_MAX)[()]
+
+
+# --- РЕЖИМ СЦЕНАРІЇВ ---
+SWEEP_W_GRID = np.round(np.linspace(0.0, 1.0, 101), 2)
+SWEEP_K_STRESS_GRID = np.round(np.linspace(0.0, 3.0, 31), 1)
+SWEEP_O12_GRID = np.linspace(S_MIN, S_MAX, 45)
+
+def sweep_scores(b_model, w_grid=SWEEP_W_GRID, k_stress_grid=SWEEP_K_STRESS_GRID, o12_grid=SWEEP_O12_GRID):
+    """
+    Усі три формули на повній сітці вага x стрес x шкільна оцінка за один прохід трансляції NumPy.
+    `b_model` - прогноз моделі (число або масив прогнозів для кількох предметів).
+    Повертає словник масивів форми b_model.shape + (len(w), len(k_stress), len(o12)).
+    """
+    b = np.asarray(b_model, dtype=float)[..., None, None, None]
+    w = np.asarray(w_grid, dtype=float)[:, None, None]
+    k_stress = np.asarray(k_stress_grid, dtype=float)[None, :, None]
+    o_12 = np.asarray(o12_grid, dtype=float)[None, None, :]
+    shape = b.shape[:-3] + (w.shape[0], k_stress.shape[1], o_12.shape[2])
+    balanced = np.broadcast_to(calculate_score_balanced(b, o_12, w), shape)
+    individual = np.broadcast_to(calculate_score_individual_adjusted(b, o_12), shape)
+    cautious = np.broadcast_to(calculate_score_cautious_stress(b, o_12, k_stress), shape)
+    return {
+        "Баланс": balanced, "Індивідуальний": individual, "Обережний": cautious,
+        "Середній з предмету": (balanced + individual + cautious) / 3,
+    }
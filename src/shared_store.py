@@ -0,0 +1,189 @@
+"""
+Спільні для всіх процесів хоста набори даних у файлах Arrow IPC.
+
+Кожен набір (main_df, пропозиції) публікується один раз на хост у каталог
+SHARED_STORE_DIR/<назва>/ як незмінний файл <версія>.arrow, а символьне посилання
+SHARED_STORE_DIR/<назва>/current вказує на поточну версію. Процеси відображають файл
+у пам'ять лише для читання і будують кадр pandas без копіювання: числові колонки, дати
+та коди категорій посилаються на сторінки файлу, тож кеш сторінок ОС тримає одну
+фізичну копію даних на всі процеси Streamlit хоста.
+
+Нова версія записується в тимчасовий файл і з'являється через os.replace, після чого
+посилання current атомарно перемикається на неї. Публікацію виконує один процес
+(блокування flock), решта чекають і відображають уже готовий файл. Файли попередніх
+версій видаляються одразу: процеси, що ще їх відображають, читають свою копію до
+переходу на нову версію, після чого ОС звільняє пам'ять і місце на диску.
+
+Порожня змінна оточення SHARED_STORE_DIR вимикає сховище - кожен процес читає дані сам.
+
+    python src/shared_store.py                # опублікувати main_df та пропозиції з src/
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+SHARED_STORE_DIR = os.environ.get('SHARED_STORE_DIR', 'src/.shared_store')
+CURRENT_LINK = 'current'
+LOCK_FILE = '.lock'
+SUFFIX = '.arrow'
+VERSION_KEY = b"nmt_shared_version"
+
+
+def version_key(*parts):
+    """Коротка назва версії набору з будь-яких JSON-серіалізованих ознак його джерела."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+_content_versions = {}
+
+
+def content_version(path):
+    """
+    Версія вмісту файлу (version_key від SHA-256), не залежна від його шляху та mtime.
+    Хеш перераховується лише тоді, коли змінилися розмір або mtime файлу.
+    """
+    stat = os.stat(path)
+    stamp = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    version = _content_versions.get(stamp)
+    if version is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source_file:
+            for block in iter(lambda: source_file.read(1 << 20), b''):
+                digest.update(block)
+        version = version_key(digest.hexdigest())
+        _content_versions[stamp] = version
+    return version
+
+
+def frame_to_table(frame):
+    """
+    Таблиця Arrow з кадру без втрат для відображення без копіювання: NaN у числових колонках
+    залишаються значеннями (а не null), категорії - словникові колонки з кодами pandas.
+    """
+    columns = []
+    for col in frame.columns:
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            columns.append(pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0),
+                                                          pa.array(values.cat.categories.to_numpy(dtype=object))))
+        elif values.dtype.kind in 'iufbM':
+            columns.append(pa.array(values.to_numpy(), from_pandas=False))
+        else:
+            columns.append(pa.array(values, from_pandas=True))
+    return pa.table(columns, names=[str(col) for col in frame.columns])
+
+
+def _column_to_pandas(column):
+    if column.num_chunks == 1:
+        chunk = column.chunk(0)
+        if pa.types.is_dictionary(chunk.type) and chunk.null_count == 0:
+            categories = pd.Index(chunk.dictionary.to_numpy(zero_copy_only=False))
+            return pd.Categorical.from_codes(chunk.indices.to_numpy(zero_copy_only=True),
+                                             dtype=pd.CategoricalDtype(categories), validate=False)
+        plain = (pa.types.is_integer(chunk.type) or pa.types.is_floating(chunk.type)
+                 or pa.types.is_timestamp(chunk.type) and chunk.type.tz is None)
+        if plain and chunk.null_count == 0:
+            return chunk.to_numpy(zero_copy_only=True)
+    # Колонки з null, рядки та кілька частин - з копіюванням
+    return column.to_pandas()
+
+
+def table_to_frame(table):
+    """Кадр pandas, колонки якого (де можливо) - представлення буферів таблиці без копіювання."""
+    return pd.DataFrame({name: pd.Series(_column_to_pandas(table.column(name)), copy=False)
+                         for name in table.column_names}, copy=False)
+
+
+class SharedStore:
+    """Каталог версій наборів даних, спільний для процесів хоста."""
+
+    def __init__(self, root=SHARED_STORE_DIR):
+        self.root = root
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _path(self, name, version):
+        return os.path.join(self._dir(name), version + SUFFIX)
+
+    def current(self, name):
+        """Поточна опублікована версія набору `name` або None."""
+        try:
+            return os.path.basename(os.readlink(os.path.join(self._dir(name), CURRENT_LINK)))[:-len(SUFFIX)]
+        except OSError:
+            return None
+
+    @contextlib.contextmanager
+    def _lock(self, name):
+        os.makedirs(self._dir(name), exist_ok=True)
+        with open(os.path.join(self._dir(name), LOCK_FILE), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def publish(self, name, frame, version):
+        """Записує `frame` як версію `version`, атомарно перемикає на неї current і видаляє старі версії."""
+        directory = self._dir(name)
+        os.makedirs(directory, exist_ok=True)
+        table = frame_to_table(frame)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), VERSION_KEY: version.encode()})
+        path = self._path(name, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        link_path = os.path.join(directory, CURRENT_LINK)
+        tmp_link = f"{link_path}.{os.getpid()}.tmp"
+        os.symlink(os.path.basename(path), tmp_link)
+        os.replace(tmp_link, link_path)
+        for file_name in os.listdir(directory):
+            if file_name.endswith(SUFFIX) and file_name != os.path.basename(path):
+                os.remove(os.path.join(directory, file_name))
+        return version
+
+    def open(self, name, version=None):
+        """Кадр версії `version` (за замовчуванням - поточної), відображений у пам'ять лише для читання."""
+        version = version if version is not None else self.current(name)
+        if version is None:
+            raise FileNotFoundError(f"{self._dir(name)}: немає опублікованої версії")
+        with pa.memory_map(self._path(name, version)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table_to_frame(table)
+
+    def load(self, name, version, build):
+        """
+        Кадр версії `version`; якщо поточна версія інша, її публікує перший процес,
+        що отримав блокування (build() викликається лише в ньому).
+        """
+        if self.current(name) != version:
+            with self._lock(name):
+                if self.current(name) != version:
+                    self.publish(name, build(), version)
+        return self.open(name, version)
+
+
+def default_store():
+    """Сховище хоста за SHARED_STORE_DIR або None, якщо його вимкнено."""
+    return SharedStore(SHARED_STORE_DIR) if SHARED_STORE_DIR else None
+
+
+if __name__ == "__main__":
+    from dataset import MAIN_DF_CSV, MAIN_DF_STORE_NAME, shared_main_df
+    from offers import KONKURS_CSV, OFFERS_PATH, OFFERS_STORE_NAME, shared_offers
+
+    store = SharedStore(sys.argv[1] if len(sys.argv) > 1 else SHARED_STORE_DIR)
+    shared_main_df(store, MAIN_DF_CSV)
+    shared_offers(store, KONKURS_CSV, OFFERS_PATH)
+    for name in (MAIN_DF_STORE_NAME, OFFERS_STORE_NAME):
+        print(f"{name}: версія {store.current(name)} у {store.root}")
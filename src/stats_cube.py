@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+SCORE_COLS = ['ukrball100', 'histball100', 'mathball100']
+
+# Гістограми з кроком 1 бал на [HIST_MIN, HIST_MAX]. Для цілих балів (як у ball100)
+# квантилі, відновлені з гістограми, збігаються з pandas.describe() точно; для дробових
+# значень похибка квантиля менша за ширину кошика (1 бал). Значення поза діапазоном
+# потрапляють у крайні кошики (впливає лише на квантилі; min/max/mean/std точні).
+HIST_MIN = 0
+HIST_MAX = 200
+N_BINS = HIST_MAX - HIST_MIN + 1
+
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+class StatsCube:
+    """
+    Матеріалізований куб статистик балів за комірками FilterIndex
+    (exam_year, regname, settlement_type, settlement_name, eoname).
+
+    Для кожної комірки та предмету зберігаються зливні підсумки: кількість, сума,
+    сума квадратів, мінімум, максимум і гістограма (розріджена матриця комірки x бали).
+    Будь-яка комбінація фільтрів відповідає набору комірок, і статистика отримується
+    злиттям їхніх підсумків без проходу по рядках.
+    """
+
+    def __init__(self, frame, filter_index, score_cols=SCORE_COLS):
+        self.score_cols = list(score_cols)
+        n_cells = filter_index.n_cells
+        # Рядки в порядку індексу: комірка кожного рядка - просто повтор номера комірки
+        order = filter_index.order
+        row_cell = np.repeat(np.arange(n_cells), np.diff(filter_index.offsets))
+
+        self.count, self.sum, self.sumsq, self.min, self.max, self.hist = {}, {}, {}, {}, {}, {}
+        for col in self.score_cols:
+            values = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=float)[order]
+            valid = ~np.isnan(values)
+            values, cells = values[valid], row_cell[valid]
+            self.count[col] = np.bincount(cells, minlength=n_cells)
+            self.sum[col] = np.bincount(cells, weights=values, minlength=n_cells)
+            self.sumsq[col] = np.bincount(cells, weights=values * values, minlength=n_cells)
+            extremes = pd.Series(values).groupby(cells).agg(['min', 'max']).reindex(range(n_cells))
+            self.min[col] = extremes['min'].to_numpy()
+            self.max[col] = extremes['max'].to_numpy()
+            bins = np.clip(np.floor(values).astype(np.int64) - HIST_MIN, 0, N_BINS - 1)
+            self.hist[col] = sparse.csr_matrix(
+                (np.ones(len(values), dtype=np.int64), (cells, bins)), shape=(n_cells, N_BINS))
+
+    def merge(self, col, cells=None):
+        """Злиті підсумки предмету для набору комірок (None - усі комірки)."""
+        if cells is None:
+            cells = slice(None)
+        count = int(self.count[col][cells].sum())
+        hist = np.asarray(self.hist[col][cells].sum(axis=0)).ravel()
+        return {
+            'count': count,
+            'sum': float(self.sum[col][cells].sum()),
+            'sumsq': float(self.sumsq[col][cells].sum()),
+            'min': float(np.nanmin(self.min[col][cells])) if count else np.nan,
+            'max': float(np.nanmax(self.max[col][cells])) if count else np.nan,
+            'hist': hist,
+        }
+
+    def describe(self, cells=None):
+        """Аналог DataFrame.describe().T для колонок балів за набором комірок."""
+        return pd.DataFrame({col: describe_summary(self.merge(col, cells)) for col in self.score_cols},
+                            index=DESCRIBE_INDEX).T
+
+
+def histogram_quantile(hist, q):
+    """
+    Квантиль з лінійною інтерполяцією (як у pandas) за гістограмою з кроком 1:
+    значення рангу k - це кошик, у який потрапляє k-те за порядком значення.
+    """
+    n = hist.sum()
+    position = (n - 1) * q
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    cumulative = np.cumsum(hist)
+    lower_value, upper_value = np.searchsorted(cumulative, [lower + 1, upper + 1]) + HIST_MIN
+    return lower_value + (upper_value - lower_value) * (position - lower)
+
+
+def describe_summary(summary):
+    """Рядок describe() (count, mean, std, min, квартилі, max) зі злитих підсумків."""
+    n = summary['count']
+    if n == 0:
+        return [0.0] + [np.nan] * 7
+    mean = summary['sum'] / n
+    std = np.sqrt(max(summary['sumsq'] - summary['sum'] * mean, 0.0) / (n - 1)) if n > 1 else np.nan
+    hist = summary['hist']
+    # Крайні кошики обрізані діапазоном, тож мінімум і максимум беремо з точних значень
+    quartiles = [min(max(histogram_quantile(hist, q), summary['min']), summary['max'])
+                 for q in (0.25, 0.5, 0.75)]
+    return [float(n), mean, std, summary['min']] + quartiles + [summary['max']]
@@ -0,0 +1,207 @@
+"""
+Легкі таймінги етапів перезапуску (rerun) сторінок Streamlit.
+
+    with span('filter_rows'):
+        ...
+
+Кожен спан потрапляє в гістограми процесу, а кешовані функції викликають cache_miss(),
+тож спан навколо їхнього виклику позначається як 'hit' або 'miss'. Файли пишуться лише
+якщо задано TELEMETRY_DIR: знімок гістограм у текстовому форматі Prometheus
+(TELEMETRY_DIR/metrics.prom, не частіше ніж раз на METRICS_INTERVAL секунд) та всі спани
+одного перезапуску одним JSON-рядком у TELEMETRY_DIR/spans.jsonl. Лог ротується:
+після SPANS_LOG_MAX_BYTES він перейменовується в spans.jsonl.1 (попередня копія видаляється).
+
+Якщо задано PROFILE_RERUN (назва сторінки або 'all'), перший перезапуск цієї сторінки
+в процесі виконується під cProfile, а результат зберігається в TELEMETRY_DIR (або в
+'telemetry', якщо його не задано): .prof для pstats/snakeviz та текстовий топ функцій.
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+TELEMETRY_DIR = os.environ.get('TELEMETRY_DIR', '')
+SPANS_LOG = 'spans.jsonl'
+SPANS_LOG_MAX_BYTES = int(os.environ.get('TELEMETRY_SPANS_MAX_BYTES', 64 * 1024 * 1024))
+METRICS_SNAPSHOT = 'metrics.prom'
+METRICS_INTERVAL = float(os.environ.get('TELEMETRY_METRICS_INTERVAL', 15))
+PROFILE_RERUN = os.environ.get('PROFILE_RERUN', '')
+PROFILE_DIR = TELEMETRY_DIR or 'telemetry'
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_current_rerun = contextvars.ContextVar('current_rerun', default=None)
+_open_spans = contextvars.ContextVar('open_spans', default=())
+_metrics_lock = threading.Lock()
+_histograms = {}
+_cache_events = {}
+_reruns = {}
+_profiled_pages = set()
+_last_snapshot = 0.0
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'seconds')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.seconds = None
+
+
+def _page():
+    rerun = _current_rerun.get()
+    return rerun['page'] if rerun is not None else ''
+
+
+def _observe(page, name, seconds, cache):
+    with _metrics_lock:
+        histogram = _histograms.setdefault((page, name), [0] * len(BUCKETS) + [0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-1] += seconds
+        if cache is not None:
+            key = (page, name, cache)
+            _cache_events[key] = _cache_events.get(key, 0) + 1
+
+
+@contextlib.contextmanager
+def span(name, cached=False, **attrs):
+    """
+    Таймінг етапу `name`; додаткові атрибути потрапляють у JSON-лог. Для виклику кешованої
+    функції (cached=True) спан позначається 'hit', якщо функція не викликала cache_miss().
+    """
+    current = Span(name, dict(attrs, cache='hit') if cached else attrs)
+    token = _open_spans.set(_open_spans.get() + (current,))
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        _open_spans.reset(token)
+        _observe(_page(), name, current.seconds, current.attrs.get('cache'))
+        rerun = _current_rerun.get()
+        if rerun is not None:
+            rerun['spans'].append({'name': name, 'ms': round(current.seconds * 1000, 3), **current.attrs})
+
+
+def cache_miss():
+    """Викликається всередині кешованої функції: найближчий відкритий спан - промах кешу."""
+    open_spans = _open_spans.get()
+    if open_spans:
+        open_spans[-1].attrs['cache'] = 'miss'
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
+        tmp_file.write(text)
+    os.replace(tmp_path, path)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def metrics_snapshot():
+    """Метрики процесу в текстовому форматі Prometheus."""
+    lines = ['# HELP nmt_span_seconds Тривалість етапів перезапуску сторінок.', '# TYPE nmt_span_seconds histogram']
+    with _metrics_lock:
+        for (page, name), histogram in sorted(_histograms.items()):
+            labels = f'page="{_label(page)}",span="{_label(name)}"'
+            for bound, count in zip(BUCKETS, histogram):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'nmt_span_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f'nmt_span_seconds_sum{{{labels}}} {histogram[-1]:.6f}')
+            lines.append(f'nmt_span_seconds_count{{{labels}}} {histogram[len(BUCKETS) - 1]}')
+        lines += ['# HELP nmt_cache_events_total Звернення до кешованих функцій за результатом.',
+                  '# TYPE nmt_cache_events_total counter']
+        for (page, name, cache), count in sorted(_cache_events.items()):
+            lines.append(f'nmt_cache_events_total{{page="{_label(page)}",span="{_label(name)}",result="{cache}"}} {count}')
+        lines += ['# HELP nmt_reruns_total Перезапуски сторінок за статусом.', '# TYPE nmt_reruns_total counter']
+        for (page, status), count in sorted(_reruns.items()):
+            lines.append(f'nmt_reruns_total{{page="{_label(page)}",status="{status}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _should_profile(page):
+    if not PROFILE_RERUN or (PROFILE_RERUN != 'all' and PROFILE_RERUN != page):
+        return False
+    with _metrics_lock:
+        if page in _profiled_pages:
+            return False
+        _profiled_pages.add(page)
+        return True
+
+
+def _save_profile(profiler, page):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"profile-{page}-{stamp}-{os.getpid()}")
+    profiler.dump_stats(base + '.prof')
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+    _write_atomic(base + '.txt', summary.getvalue())
+
+
+def _append_spans(record):
+    """Дописує перезапуск у spans.jsonl; файл, що перевищив SPANS_LOG_MAX_BYTES, ротується."""
+    path = os.path.join(TELEMETRY_DIR, SPANS_LOG)
+    with open(path, 'a', encoding='utf-8') as log_file:
+        log_file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        size = log_file.tell()
+    if size > SPANS_LOG_MAX_BYTES:
+        os.replace(path, path + '.1')
+
+
+def _snapshot_due():
+    """Чи минуло METRICS_INTERVAL секунд з останнього знімка метрик процесу."""
+    global _last_snapshot
+    now = time.monotonic()
+    with _metrics_lock:
+        if now - _last_snapshot < METRICS_INTERVAL:
+            return False
+        _last_snapshot = now
+        return True
+
+
+@contextlib.contextmanager
+def rerun(page):
+    """Один перезапуск сторінки: збирає спани, пише JSON-рядок і оновлює знімок метрик."""
+    record = {'page': page, 'ts': time.time(), 'spans': []}
+    token = _current_rerun.set(record)
+    profiler = cProfile.Profile() if _should_profile(page) else None
+    status = 'ok'
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as e:
+        # st.stop() та st.rerun() завершують скрипт винятками Streamlit - це не помилки
+        status = 'stopped' if type(e).__name__ in ('StopException', 'RerunException') else 'error'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        record['status'] = status
+        _current_rerun.reset(token)
+        _observe(page, 'rerun', record['ms'] / 1000, None)
+        with _metrics_lock:
+            _reruns[(page, status)] = _reruns.get((page, status), 0) + 1
+        try:
+            if TELEMETRY_DIR:
+                os.makedirs(TELEMETRY_DIR, exist_ok=True)
+                _append_spans(record)
+                if _snapshot_due():
+                    _write_atomic(os.path.join(TELEMETRY_DIR, METRICS_SNAPSHOT), metrics_snapshot())
+            if profiler is not None:
+                _save_profile(profiler, page)
+        except OSError:
+            pass